@@ -2,11 +2,17 @@ from __future__ import annotations
 
 import discord
 import logging
+import pathlib
+import tempfile
 
 from discord import app_commands
 from discord.ext import commands
 
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Counter, Literal
+
+from utils.export import TeamExporter, parquet_available
+from utils.fanout import run_side_effects
+from utils.models import MAX_TEAM_SIZE
 
 if TYPE_CHECKING:
     from main import Bot
@@ -23,14 +29,13 @@ class Admin(commands.GroupCog, group_name='admin'):
     async def verify(self, interaction: discord.Interaction, member: discord.Member, full_name: str, grade: str, school: str, shsm_sector: str):
         """Verify a user."""
         await interaction.response.defer(thinking=True, ephemeral=True)
-        await self.bot.database.create_user_if_not_exists({
+        await self.bot.add_registrant({
             'discord_username': str(member),
             'full_name': full_name,
             'grade': grade,
             'school': school,
             'shsm_sector': shsm_sector,
         }, member)
-        # TODO: Improve
         hacker_role = interaction.guild and interaction.guild.get_role(self.bot.config.bot.hacker_role_id)
         if hacker_role is None:
             embed = self.bot.error_embed(
@@ -39,7 +44,6 @@ class Admin(commands.GroupCog, group_name='admin'):
             )
             await interaction.followup.send(embed=embed)
             return
-        await member.add_roles(hacker_role)
         unverified_role = interaction.guild and interaction.guild.get_role(self.bot.config.bot.unverified_role_id)
         if unverified_role is None:
             embed = self.bot.error_embed(
@@ -49,14 +53,108 @@ class Admin(commands.GroupCog, group_name='admin'):
             await interaction.followup.send(embed=embed)
             return
 
-        await member.remove_roles(unverified_role)
-        await member.edit(nick=full_name)
+        nick_error = await self.bot.member_edits.edit(member, add_roles=[hacker_role], remove_roles=[unverified_role], nick=full_name, priority=True)
         embed = self.bot.success_embed(
             title="User Verified",
             description=f"{member} has been verified."
         )
+        if nick_error is not None:
+            embed.add_field(name="Nickname Not Set", value=f"Their nickname could not be changed: {nick_error.text or nick_error.status}")
         await interaction.followup.send(embed=embed)
-        await self.bot.log_message(f"{interaction.user.mention} verified {member.mention}.")
+        await run_side_effects(self.bot.log_message(f"{interaction.user.mention} verified {member.mention}."), description=f"verify log for {member}")
+
+    @app_commands.command()
+    @app_commands.checks.has_permissions(administrator=True)
+    async def reload(self, interaction: discord.Interaction):
+        """Reload the registrations file."""
+        self.bot.load_registrant_discord_mapping()
+        embed = self.bot.success_embed(
+            title="Registrations Reloaded",
+            description=f"Loaded {len(self.bot.registrant_discord_mapping)} registrations."
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        await run_side_effects(self.bot.log_message(f"{interaction.user.mention} reloaded the registrations."), description=f"reload log for {interaction.user}")
+
+    @app_commands.command()
+    @app_commands.checks.has_permissions(administrator=True)
+    @app_commands.describe(file_format="The file format of the export", teams="Which teams to include")
+    async def export(self, interaction: discord.Interaction, file_format: Literal['csv', 'parquet'] = 'csv', teams: Literal['all', 'full', 'open'] = 'all'):
+        """Export all teams, members and invites, including archived invites."""
+        if file_format == 'parquet' and not parquet_available():
+            await interaction.response.send_message(embed=self.bot.error_embed(
+                title="Parquet Unavailable",
+                description="Install `pyarrow` to export to parquet, or export to csv instead."
+            ), ephemeral=True)
+            return
+
+        await interaction.response.defer(thinking=True, ephemeral=True)
+        with tempfile.TemporaryDirectory() as directory:
+            exporter = TeamExporter(self.bot, interaction.guild, pathlib.Path(directory), file_format, teams)  # type: ignore
+            files = await exporter.export()
+            embed = self.bot.success_embed(
+                title="Export Complete",
+                description=f"Exported {len(exporter.teams)} teams ({teams}) as {file_format}."
+            )
+            await interaction.followup.send(embed=embed, files=files)
+
+        await run_side_effects(self.bot.log_message(f"{interaction.user.mention} exported the {teams} teams as {file_format}."), description=f"export log for {interaction.user}")
+
+    @app_commands.command()
+    @app_commands.checks.has_permissions(administrator=True)
+    async def stats(self, interaction: discord.Interaction):
+        """View event statistics."""
+        stats = self.bot.stats
+        if not stats.ready:
+            await interaction.response.send_message(embed=self.bot.error_embed(
+                title="Statistics Loading",
+                description="Event statistics are still loading, please try again in a moment."
+            ), ephemeral=True)
+            return
+
+        def top(counter: Counter[str], limit: int = 10) -> str:
+            return '\n'.join(f"{discord.utils.escape_markdown(key)}: **{count}**" for key, count in counter.most_common(limit) if count > 0) or "None"
+
+        fill = '\n'.join(f"{size}/{MAX_TEAM_SIZE}: **{stats.team_fill[size]}**" for size in range(1, MAX_TEAM_SIZE + 1))
+        edits = self.bot.member_edits.stats()
+
+        embed = self.bot.info_embed("📊 Event Statistics")
+        embed.add_field(name="Users", value=(
+            f"Verified: **{len(stats.verified)}**\n"
+            f"Unverified: **{len(stats.unverified)}**\n"
+            f"Registrations: **{stats.registrations}**"
+        ), inline=True)
+        embed.add_field(name="Teams", value=(
+            f"Teams: **{stats.teams}**\n"
+            f"In a team: **{stats.members_in_teams}**\n"
+            f"Pending invites: **{len(stats.pending_invites)}**"
+        ), inline=True)
+        embed.add_field(name="Team Fill", value=fill, inline=True)
+        embed.add_field(name="Schools", value=top(stats.schools), inline=True)
+        embed.add_field(name="Grades", value=top(stats.grades), inline=True)
+        embed.add_field(name="SHSM Sectors", value=top(stats.shsm_sectors), inline=True)
+        embed.add_field(name="Member Edits", value=(
+            f"Pending: **{edits['pending']}**\n"
+            f"Failed edits/nicknames: **{edits['failed_edits']}** / **{edits['failed_nicks']}**\n"
+            f"Queue latency p50/p99: **{edits['queue_latency_p50']:.2f}s** / **{edits['queue_latency_p99']:.2f}s**"
+        ), inline=False)
+
+        hit_rate = self.bot.fast_path.hit_rate()
+        fast_path = self.bot.fast_path
+        slowest = sorted(fast_path.deferred, key=lambda command: fast_path.hit_rate(command) or 0.0)[:3]
+        embed.add_field(name="Fast Path", value=(
+            f"Answered without deferring: **{'n/a' if hit_rate is None else f'{hit_rate:.0%}'}**\n"
+            + '\n'.join(f"/{command}: **{fast_path.hit_rate(command):.0%}**" for command in slowest)
+        ), inline=False)
+
+        loop = self.bot.watchdog.stats()
+        stall_sites = '\n'.join(f"`{site}`: **{count}**" for site, count in loop['top_sites'] if '`' not in site)
+        embed.add_field(name="Event Loop", value=(
+            f"Lag p50/p99/max: **{loop['lag_p50'] * 1000:.0f}ms** / **{loop['lag_p99'] * 1000:.0f}ms** / **{loop['lag_max'] * 1000:.0f}ms**\n"
+            f"Stalls over {self.bot.watchdog.threshold * 1000:.0f}ms: **{loop['stalls']}**"
+            + (f"\nLast: {discord.utils.escape_markdown(loop['last_stall'].describe())}" if loop['last_stall'] else "")
+            + (f"\n{stall_sites}" if stall_sites else "")
+        ), inline=False)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
 
 async def setup(bot: Bot) -> None:
     await bot.add_cog(Admin(bot), guilds=[discord.Object(bot.config.bot.guild_id)])
@@ -1,11 +1,14 @@
 from __future__ import annotations
 
+import asyncio
 import discord
 import logging
 
 from discord import app_commands
 from discord.ext import commands
 
+from utils.fanout import run_side_effects
+
 from typing import TYPE_CHECKING, cast
 
 if TYPE_CHECKING:
@@ -21,21 +24,25 @@ class Profile(commands.GroupCog, group_name='profile'):
     @app_commands.command(name='set')
     async def set(self, interaction: discord.Interaction, description: str):
         """Set or view your profile description."""
-        await interaction.response.defer(thinking=True)
+        reply = self.bot.fast_path.reply(interaction)
         if len(description) > 150:
-            await interaction.followup.send(embed=self.bot.error_embed(
+            await reply.send(embed=self.bot.error_embed(
                 title="Description Too Long",
                 description="Your profile description cannot exceed 150 characters."
             ))
             return
 
         await self.bot.database.update_user_about(interaction.user, description)
+        self.bot.dispatch('profile_update', interaction.user.id, description)
         embed = self.bot.info_embed(
             title="Profile Updated",
             description=f"Your profile description has been updated to: {description}"
         )
-        await interaction.followup.send(embed=embed)
-        await self.bot.log_message(f"{interaction.user.mention} updated their profile description to: {description}")
+        await reply.send(embed=embed)
+        await run_side_effects(
+            self.bot.log_message(f"{interaction.user.mention} updated their profile description to: {description}"),
+            description=f"profile update log for {interaction.user}",
+        )
 
     @app_commands.command(name='view')
     async def view(self, interaction: discord.Interaction, member: discord.Member | None = None):
@@ -43,28 +50,30 @@ class Profile(commands.GroupCog, group_name='profile'):
         if member is None:
             member = cast(discord.Member, interaction.user)
 
-        await interaction.response.defer(thinking=True)
+        reply = self.bot.fast_path.reply(interaction)
 
-        registration = await self.bot.get_or_fetch_user_registration(member)
+        registration, user_data, team = await asyncio.gather(
+            self.bot.get_or_fetch_user_registration(member),
+            self.bot.database.fetch_user(member),
+            self.bot.database.fetch_team_by_member_id(member.id),
+        )
         if registration is None:
             embed = self.bot.error_embed(
                 title="Profile Not Found",
                 description=f"{member} is not registered."
             )
-            await interaction.followup.send(embed=embed)
+            await reply.send(embed=embed)
             return
 
-        user_data = await self.bot.database.fetch_user(member)
         if user_data is None:
             embed = self.bot.error_embed(
                 title="Profile Not Found",
                 description=f"{member} is not registered."
             )
-            await interaction.followup.send(embed=embed)
+            await reply.send(embed=embed)
             return
 
         about = user_data["about"] if user_data else None
-        team = await self.bot.database.fetch_team_by_member_id(member.id)
         if team:
             team_name = team['name']
         else:
@@ -81,7 +90,7 @@ class Profile(commands.GroupCog, group_name='profile'):
         embed.add_field(name="School", value=user_data["school"], inline=True)
         embed.add_field(name="Team", value=team_name, inline=True)
         embed.add_field(name="SHSM Sector", value=user_data["shsm_sector"], inline=True)
-        await interaction.followup.send(embed=embed)
+        await reply.send(embed=embed)
 
 async def setup(bot: Bot) -> None:
     await bot.add_cog(Profile(bot), guilds=[discord.Object(bot.config.bot.guild_id)])
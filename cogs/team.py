@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import asyncio
+
 from discord import app_commands
 from discord.ext import commands
 import discord
@@ -9,6 +11,9 @@ from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from main import Bot
 
+from utils.fanout import run_side_effects
+from utils.matchmaking import keyword_tokens, profile_tokens
+from utils.models import MAX_TEAM_SIZE
 from views.team_invite import TeamInviteView
 
 async def check_user_is_registrant(interaction: discord.Interaction[Bot]) -> bool:
@@ -53,65 +58,83 @@ class Team(commands.GroupCog, group_name='team'):
     @app_commands.autocomplete(member=team_member_autocomplete)
     async def remove(self, interaction: discord.Interaction, member: int):
         """Remove a member from your team."""
-        await interaction.response.defer(thinking=True)
+        reply = self.bot.fast_path.reply(interaction)
         guild_member = interaction.guild.get_member(member)  # type: ignore
         if guild_member is None:
-            await interaction.followup.send(embed=self.bot.error_embed("Member not found!"))
+            await reply.send(embed=self.bot.error_embed("Member not found!"))
             return
 
         if guild_member == interaction.user:
-            await interaction.followup.send(embed=self.bot.error_embed("You cannot remove yourself!"))
+            await reply.send(embed=self.bot.error_embed("You cannot remove yourself!"))
             return
 
-        team = await self.bot.database.fetch_team_by_member_id(interaction.user.id)
+        team, registration = await asyncio.gather(
+            self.bot.database.fetch_team_by_member_id(interaction.user.id),
+            self.bot.get_or_fetch_user_registration(guild_member),
+        )
         if not team:
-            await interaction.followup.send(embed=self.bot.error_embed("You do not own a team!"))
+            await reply.send(embed=self.bot.error_embed("You do not own a team!"))
             return
 
         members = await self.bot.database.fetch_team_members(team['id'])
         if guild_member not in members:
-            await interaction.followup.send(embed=self.bot.error_embed(f"`{guild_member.display_name}` is not in your team!"))
+            await reply.send(embed=self.bot.error_embed(f"`{guild_member.display_name}` is not in your team!"))
 
-        if not await self.bot.get_or_fetch_user_registration(guild_member):
-            await interaction.followup.send(embed=self.bot.error_embed(f"`{guild_member.display_name}` is not registered."))
-        await interaction.followup.send(embed=self.bot.success_embed(f"Removed `{guild_member.display_name}` from the team!"))
+        if not registration:
+            await reply.send(embed=self.bot.error_embed(f"`{guild_member.display_name}` is not registered."))
+        await reply.send(embed=self.bot.success_embed(f"Removed `{guild_member.display_name}` from the team!"))
 
     @app_commands.command(name='accept')
     @app_commands.autocomplete(team=team_invite_autocomplete)
     async def accept(self, interaction: discord.Interaction, team: int):
         """Accept a team invitation."""
-        await interaction.response.defer(thinking=True)
+        reply = self.bot.fast_path.reply(interaction)
 
-        team_record = await self.bot.database.fetch_team_by_id(team)
+        team_record, existing_team = await asyncio.gather(
+            self.bot.database.fetch_team_by_id(team),
+            self.bot.database.fetch_team_by_member_id(interaction.user.id),
+        )
         if not team_record:
-            await interaction.followup.send(embed=self.bot.error_embed("Team not found!"))
+            await reply.send(embed=self.bot.error_embed("Team not found!"))
             return
 
-        existing_team = await self.bot.database.fetch_team_by_member_id(interaction.user.id)
         if existing_team:
-            await interaction.followup.send(embed=self.bot.error_embed("You must leave your existing team before accepting a new one!"))
+            await reply.send(embed=self.bot.error_embed("You must leave your existing team before accepting a new one!"))
+            return
+
+        if team_record['member_count'] >= MAX_TEAM_SIZE:
+            await reply.send(embed=self.bot.error_embed("This team is already full!"))
             return
 
-        if team_record['member_count'] >= 4:
-            await interaction.followup.send(embed=self.bot.error_embed("This team is already full!"))
+        invite = await self.bot.database.accept_team_invite(interaction.user, team)
+        if invite is None:
+            await reply.send(embed=self.bot.error_embed("You do not have a pending invite to this team!"))
             return
 
-        await self.bot.database.accept_team_invite(interaction.user, team)
-        await interaction.followup.send(f"You have accepted the invitation to join the team `{team}`!")
+        self.bot.dispatch('team_join', team, interaction.user.id)
+        self.bot.dispatch('team_invite_resolve', team, interaction.user.id)
+        await reply.send(f"You have accepted the invitation to join the team `{team}`!")
+        await run_side_effects(self.bot.invite_sweeper.close(invite), description=f"accepted team invite cleanup for {interaction.user}")
 
     @app_commands.command(name='decline')
     @app_commands.autocomplete(team=team_invite_autocomplete)
     async def decline(self, interaction: discord.Interaction, team: int):
         """Decline a team invitation."""
-        await interaction.response.defer(thinking=True)
+        reply = self.bot.fast_path.reply(interaction)
         # validate team
         team_record = await self.bot.database.fetch_team_by_id(team)
         if not team_record:
-            await interaction.followup.send(embed=self.bot.error_embed("Team not found!"))
+            await reply.send(embed=self.bot.error_embed("Team not found!"))
             return
 
-        await self.bot.database.decline_team_invite(interaction.user, team)
-        await interaction.followup.send(f"You have declined the invitation to join the team `{team}`!")
+        invite = await self.bot.database.decline_team_invite(interaction.user, team)
+        if invite is None:
+            await reply.send(embed=self.bot.error_embed("You do not have a pending invite to this team!"))
+            return
+
+        self.bot.dispatch('team_invite_resolve', team, interaction.user.id)
+        await reply.send(f"You have declined the invitation to join the team `{team}`!")
+        await run_side_effects(self.bot.invite_sweeper.close(invite), description=f"declined team invite cleanup for {interaction.user}")
 
     @app_commands.command(name='create')
     async def create(self, interaction: discord.Interaction, name: str):
@@ -128,122 +151,151 @@ class Team(commands.GroupCog, group_name='team'):
             await interaction.response.send_message(embed=self.bot.error_embed("Team name must be alphanumeric."))
             return
 
-        await interaction.response.defer(thinking=True)
+        reply = self.bot.fast_path.reply(interaction)
 
         existing_team = await self.bot.database.fetch_team_by_member_id(interaction.user.id)
         if existing_team:
-            await interaction.followup.send(embed=self.bot.error_embed("You are already in a team!"))
+            await reply.send(embed=self.bot.error_embed("You are already in a team!"))
             return
 
-        success = await self.bot.database.create_team(name, interaction.user)
-        if not success:
-            await interaction.followup.send(embed=self.bot.error_embed(f"Team `{discord.utils.escape_markdown(name)}` already exists! Please try a different name."))
+        team_record = await self.bot.database.create_team(name, interaction.user)
+        if not team_record:
+            await reply.send(embed=self.bot.error_embed(f"Team `{discord.utils.escape_markdown(name)}` already exists! Please try a different name."))
         else:
-            await interaction.followup.send(embed=self.bot.success_embed(f"Team `{discord.utils.escape_markdown(name)}` has been created!"))
-
-        await self.bot.log_message(f"{interaction.user.mention} has created a team `{discord.utils.escape_markdown(name)}`.")
+            self.bot.dispatch('team_create', team_record['id'], team_record['name'], interaction.user.id)
+            await reply.send(embed=self.bot.success_embed(f"Team `{discord.utils.escape_markdown(name)}` has been created!"))
+            await run_side_effects(
+                self.bot.log_message(f"{interaction.user.mention} has created a team `{discord.utils.escape_markdown(name)}`."),
+                description=f"team create log for {interaction.user}",
+            )
 
     @app_commands.command(name='delete')
     async def delete(self, interaction: discord.Interaction):
         """Delete your team."""
-        await interaction.response.defer(thinking=True)
+        reply = self.bot.fast_path.reply(interaction)
         data = await self.bot.database.delete_team(interaction.user)
         if not data:
-            await interaction.followup.send(embed=self.bot.error_embed("You do not own a team!"))
+            await reply.send(embed=self.bot.error_embed("You do not own a team!"))
         else:
-            await interaction.followup.send(embed=self.bot.success_embed(f"Team `{discord.utils.escape_markdown(data[0]['name'])}` has been deleted!"))
-
-        await self.bot.log_message(f"{interaction.user.mention} has deleted the team `{discord.utils.escape_markdown(data[0]['name'])}`.")
+            self.bot.dispatch('team_delete', data[0]['id'])
+            await reply.send(embed=self.bot.success_embed(f"Team `{discord.utils.escape_markdown(data[0]['name'])}` has been deleted!"))
+            await run_side_effects(
+                self.bot.log_message(f"{interaction.user.mention} has deleted the team `{discord.utils.escape_markdown(data[0]['name'])}`."),
+                description=f"team delete log for {interaction.user}",
+            )
 
     @app_commands.command(name='invite')
     async def invite(self, interaction: discord.Interaction, member: discord.Member):
         """Invite a member to your team."""
-        await interaction.response.defer(thinking=True)
+        reply = self.bot.fast_path.reply(interaction)
 
         inviter = interaction.user
-        team_data = await self.bot.database.fetch_team_by_member_id(inviter.id)
-        if team_data is None:
-            await interaction.followup.send(embed=self.bot.error_embed("You do not own a team!"))
+        if member == interaction.user:
+            await reply.send(embed=self.bot.error_embed("You cannot invite yourself!"))
             return
 
-        if member == interaction.user:
-            await interaction.followup.send(embed=self.bot.error_embed("You cannot invite yourself!"))
+        team_data, registration, existing_team = await asyncio.gather(
+            self.bot.database.fetch_team_by_member_id(inviter.id),
+            self.bot.get_or_fetch_user_registration(member),
+            self.bot.database.fetch_team_by_member_id(member.id),
+        )
+        if team_data is None:
+            await reply.send(embed=self.bot.error_embed("You do not own a team!"))
             return
 
-        if not self.bot.get_or_fetch_user_registration(member):
-            await interaction.followup.send(embed=self.bot.error_embed(f"{member.display_name} is not registered."))
+        if not registration:
+            await reply.send(embed=self.bot.error_embed(f"{member.display_name} is not registered."))
             return
 
-        existing_team = await self.bot.database.fetch_team_by_member_id(member.id)
         if existing_team:
-            await interaction.followup.send(embed=self.bot.error_embed(f"{member.display_name} is already in a team!"))
+            await reply.send(embed=self.bot.error_embed(f"{member.display_name} is already in a team!"))
+            return
+
+        invite = await self.bot.database.invite_to_team(inviter, member, self.bot.invite_sweeper.ttl)
+        if invite is None:
+            await reply.send(embed=self.bot.error_embed("You do not own a team!"))
             return
 
         # TODO: Show team members?
         view = TeamInviteView(self.bot, team_data['name'], inviter, member, team_data['id'])
+        self.bot.invite_sweeper.track(team_data['id'], member.id, view)
 
         embed = self.bot.info_embed("🤝 Team Invitation")
         embed.add_field(name="Team", value=team_data['name'], inline=False)
         embed.add_field(name="Invited By", value=inviter.mention, inline=False)
+        embed.add_field(name="Expires", value=discord.utils.format_dt(discord.utils.utcnow() + self.bot.invite_sweeper.ttl, 'R'), inline=False)
         embed.set_footer(text="Click a button below to accept or decline.")
 
         try:
-            await member.send(embed=embed, view=view)
-            await interaction.followup.send(embed=self.bot.success_embed(f"Sent a team invite to {member.display_name}!"))
+            message = await member.send(embed=embed, view=view)
+            await reply.send(embed=self.bot.success_embed(f"Sent a team invite to {member.display_name}!"))
         except discord.Forbidden:
-            await interaction.followup.send(member.mention, embed=embed, view=view)
+            message = await reply.send(member.mention, embed=embed, view=view)
                 # await interaction.followup.send(embed=self.bot.error_embed(f"Unable to message {member.display_avatar}."))
 
-        await self.bot.log_message(f"{inviter.mention} invited {member.mention} to join `{discord.utils.escape_markdown(team_data['name'])}`.")
-        await view.wait()
+        self.bot.dispatch('team_invite', team_data['id'], member.id)
+        await run_side_effects(
+            self.bot.database.set_team_invite_message(invite['id'], message.channel.id, message.id),
+            self.bot.log_message(f"{inviter.mention} invited {member.mention} to join `{discord.utils.escape_markdown(team_data['name'])}`."),
+            description=f"team invite from {inviter} to {member}",
+        )
 
     @app_commands.command(name='kick')
     @app_commands.autocomplete(member=team_member_autocomplete)
     async def kick(self, interaction: discord.Interaction, member: int):
         """Kick a member from your team."""
-        await interaction.response.defer(thinking=True)
+        reply = self.bot.fast_path.reply(interaction)
         if member == interaction.user.id:
-            await interaction.followup.send(embed=self.bot.error_embed("You cannot kick yourself!"))
+            await reply.send(embed=self.bot.error_embed("You cannot kick yourself!"))
             return
 
-        team = await self.bot.database.fetch_team_by_member_id(interaction.user.id)
+        team, member_team = await asyncio.gather(
+            self.bot.database.fetch_team_by_member_id(interaction.user.id),
+            self.bot.database.fetch_team_by_member_id(member),
+        )
         if not team or team['owner_id'] != interaction.user.id:
-            await interaction.followup.send(embed=self.bot.error_embed("You do not own a team!"))
+            await reply.send(embed=self.bot.error_embed("You do not own a team!"))
             return
 
         guild_member: discord.Member = interaction.guild.get_member(member)  # type: ignore
         if not guild_member:
-            await interaction.followup.send(embed=self.bot.error_embed("Member not found!"))
+            await reply.send(embed=self.bot.error_embed("Member not found!"))
             return
 
-        member_team = await self.bot.database.fetch_team_by_member_id(member)
         if not member_team or member_team['id'] != team['id']:
-            await interaction.followup.send(embed=self.bot.error_embed(f"`{guild_member.display_name}` is not in your team!"))
+            await reply.send(embed=self.bot.error_embed(f"`{guild_member.display_name}` is not in your team!"))
             return
 
         await self.bot.database.kick_from_team(guild_member)
-        await interaction.followup.send(embed=self.bot.success_embed(f"Removed `{guild_member.display_name}` from the team!"))
-        await guild_member.send(embed=self.bot.info_embed(f"You have been removed from the team `{discord.utils.escape_markdown(team['name'])}`."))
-        await self.bot.log_message(f"{interaction.user.mention} kicked {guild_member.display_name} from the team `{discord.utils.escape_markdown(team['name'])}`.")
+        self.bot.dispatch('team_leave', team['id'], guild_member.id)
+        await reply.send(embed=self.bot.success_embed(f"Removed `{guild_member.display_name}` from the team!"))
+        await run_side_effects(
+            guild_member.send(embed=self.bot.info_embed(f"You have been removed from the team `{discord.utils.escape_markdown(team['name'])}`.")),
+            self.bot.log_message(f"{interaction.user.mention} kicked {guild_member.display_name} from the team `{discord.utils.escape_markdown(team['name'])}`."),
+            description=f"team kick of {guild_member} by {interaction.user}",
+        )
 
     @app_commands.command(name='leave')
     async def leave(self, interaction: discord.Interaction):
         """Leave the current team."""
-        await interaction.response.defer(thinking=True)
+        reply = self.bot.fast_path.reply(interaction)
         existing_team = await self.bot.database.fetch_team_by_member_id(interaction.user.id)
         if not existing_team:
-            await interaction.followup.send(embed=self.bot.error_embed("You are not in a team!"))
+            await reply.send(embed=self.bot.error_embed("You are not in a team!"))
             return
         if existing_team['owner_id'] == interaction.user.id:
-            await interaction.followup.send(embed=self.bot.error_embed("You cannot leave your own team! Please delete it instead."))
+            await reply.send(embed=self.bot.error_embed("You cannot leave your own team! Please delete it instead."))
             return
         response = await self.bot.database.leave_team(interaction.user)
         if not response:
-            await interaction.followup.send(embed=self.bot.error_embed("You are not in a team!"))
+            await reply.send(embed=self.bot.error_embed("You are not in a team!"))
         else:
-            await interaction.followup.send(embed=self.bot.success_embed(f"You have left the team `{discord.utils.escape_markdown(response[0]['name'])}`!"))
-
-        await self.bot.log_message(f"{interaction.user.mention} has left the team `{discord.utils.escape_markdown(response[0]['name'])}`.")
+            self.bot.dispatch('team_leave', existing_team['id'], interaction.user.id)
+            await reply.send(embed=self.bot.success_embed(f"You have left the team `{discord.utils.escape_markdown(response[0]['name'])}`!"))
+            await run_side_effects(
+                self.bot.log_message(f"{interaction.user.mention} has left the team `{discord.utils.escape_markdown(response[0]['name'])}`."),
+                description=f"team leave log for {interaction.user}",
+            )
 
     @app_commands.command(name='rename')
     async def rename(self, interaction: discord.Interaction, new_name: str):
@@ -260,25 +312,29 @@ class Team(commands.GroupCog, group_name='team'):
             await interaction.response.send_message(embed=self.bot.error_embed("Team name must be alphanumeric."))
             return
 
-        await interaction.response.defer(thinking=True)
+        reply = self.bot.fast_path.reply(interaction)
 
         response = await self.bot.database.rename_team(interaction.user.id, new_name)
         if not response:
-            await interaction.followup.send(embed=self.bot.error_embed("You do not own a team!"))
+            await reply.send(embed=self.bot.error_embed("You do not own a team!"))
             return
 
-        await interaction.followup.send(embed=self.bot.success_embed(f"Team has been renamed to `{discord.utils.escape_markdown(new_name)}`!"))
-        await self.bot.log_message(f"Team `{discord.utils.escape_markdown(new_name)}` has been renamed by {interaction.user.mention}.")
+        self.bot.dispatch('team_rename', response[0]['id'], new_name)
+        await reply.send(embed=self.bot.success_embed(f"Team has been renamed to `{discord.utils.escape_markdown(new_name)}`!"))
+        await run_side_effects(
+            self.bot.log_message(f"Team `{discord.utils.escape_markdown(new_name)}` has been renamed by {interaction.user.mention}."),
+            description=f"team rename log for {interaction.user}",
+        )
 
     @app_commands.command(name='view')
     @app_commands.autocomplete(team=team_autocomplete)
     async def view(self, interaction: discord.Interaction, team: int | None):
         """View the current team details."""
-        await interaction.response.defer(thinking=True)
+        reply = self.bot.fast_path.reply(interaction)
         if team is None:
             team_record = await self.bot.database.fetch_team_by_member_id(interaction.user.id)
             if not team_record:
-                await interaction.followup.send(embed=self.bot.error_embed("Please specify a team!"))
+                await reply.send(embed=self.bot.error_embed("Please specify a team!"))
                 return
             team = team_record['id']
             team_name = team_record['name']
@@ -286,7 +342,7 @@ class Team(commands.GroupCog, group_name='team'):
         else:
             team_record = await self.bot.database.fetch_team_by_id(team)
             if not team_record:
-                await interaction.followup.send(embed=self.bot.error_embed("Team not found!"))
+                await reply.send(embed=self.bot.error_embed("Team not found!"))
                 return
             team_name = team_record['name']
             owner = discord.Object(id=team_record['owner_id'])
@@ -296,23 +352,59 @@ class Team(commands.GroupCog, group_name='team'):
             [f"👑 <@{member.id}>" if member.id == owner.id else f"💻 <@{member.id}>" for member in members]
         )
         embed = discord.Embed(title=f"Team `{team_name}`", description=description)
-        await interaction.followup.send(embed=embed)
+        await reply.send(embed=embed)
 
     @app_commands.command(name='viewall')
     async def viewall(self, interaction: discord.Interaction):
         """View all teams."""
-        await interaction.response.defer(thinking=True)
+        reply = self.bot.fast_path.reply(interaction)
         teams = await self.bot.database.fetch_teams(interaction.user)
         if not teams:
-            await interaction.followup.send(embed=self.bot.error_embed("You do not own a team!"))
+            await reply.send(embed=self.bot.error_embed("You do not own a team!"))
             return
 
         description = '\n'.join(
-            [f"**{i}.** {team['name']} ({team['member_count']}/4)" for i, team in enumerate(teams, start=1)]
+            [f"**{i}.** {team['name']} ({team['member_count']}/{MAX_TEAM_SIZE})" for i, team in enumerate(teams, start=1)]
         )
         embed = discord.Embed(title="Teams", description=description)
 
-        await interaction.followup.send(embed=embed)
+        await reply.send(embed=embed)
+
+    @app_commands.command(name='find')
+    @app_commands.check(check_user_is_registrant)
+    @app_commands.describe(keywords="Extra keywords to match, e.g. skills or interests")
+    async def find(self, interaction: discord.Interaction, keywords: str | None = None):
+        """Find people looking for a team and teams with open slots."""
+        matchmaking = self.bot.matchmaking
+        if not matchmaking.ready:
+            await interaction.response.send_message(embed=self.bot.error_embed("Matchmaking is still loading, please try again in a moment."), ephemeral=True)
+            return
+
+        tokens = matchmaking.tokens_for(interaction.user.id)
+        if not tokens:
+            registration = await self.bot.get_or_fetch_user_registration(interaction.user)
+            if registration is not None:
+                tokens = profile_tokens(registration['school'], registration['grade'], registration['shsm_sector'], None)
+        tokens |= keyword_tokens(keywords)
+
+        indexed_user = matchmaking.users.get(interaction.user.id)
+        own_team_id = indexed_user.team_id if indexed_user else None
+        users = matchmaking.find_users(tokens, interaction.user.id)
+        teams = matchmaking.find_teams(tokens, own_team_id)
+
+        embed = self.bot.info_embed("🔎 Team Finder")
+        embed.add_field(
+            name="Looking for a team",
+            value='\n'.join(f"<@{user.discord_id}> • {user.school}, grade {user.grade}" for user, _ in users) or "Nobody found.",
+            inline=False,
+        )
+        embed.add_field(
+            name="Teams with open slots",
+            value='\n'.join(f"`{discord.utils.escape_markdown(team.name)}` ({len(team.member_ids)}/{MAX_TEAM_SIZE})" for team, _ in teams) or "No teams found.",
+            inline=False,
+        )
+        embed.set_footer(text="Set your profile description with /profile set to improve your matches.")
+        await interaction.response.send_message(embed=embed, allowed_mentions=discord.AllowedMentions.none())
 
 async def setup(bot: Bot) -> None:
     await bot.add_cog(Team(bot), guilds=[discord.Object(bot.config.bot.guild_id)])
@@ -1,6 +1,8 @@
+DROP TABLE IF EXISTS team_invites_archive CASCADE;
 DROP TABLE IF EXISTS team_invites CASCADE;
 DROP TABLE IF EXISTS teams CASCADE;
 DROP TABLE IF EXISTS users CASCADE;
+DROP TABLE IF EXISTS deleted_rows CASCADE;
 
 CREATE TABLE users (
     id SERIAL PRIMARY KEY,
@@ -11,7 +13,7 @@ CREATE TABLE users (
     shsm_sector TEXT DEFAULT 'None',
     about TEXT,
     created_at TIMESTAMP DEFAULT now(),
-    updated_at TIMESTAMP DEFAULT now(),
+    updated_at TIMESTAMP DEFAULT now()
 );
 
 CREATE TABLE teams (
@@ -26,26 +28,127 @@ CREATE TABLE teams (
 ALTER TABLE users
 ADD COLUMN team_id INTEGER REFERENCES teams(id) ON DELETE SET NULL;
 
+-- The bot keeps an in-memory replica of users and teams and syncs rows changed since the newest updated_at it has
+-- seen, so updated_at must change on every write. Deletes leave a tombstone in deleted_rows for the same reason.
+CREATE TABLE deleted_rows (
+    id SERIAL PRIMARY KEY,
+    table_name TEXT NOT NULL,
+    row_id INTEGER NOT NULL,
+    deleted_at TIMESTAMP DEFAULT now()
+);
+
+CREATE INDEX users_updated_at_idx ON users (updated_at);
+CREATE INDEX teams_updated_at_idx ON teams (updated_at);
+CREATE INDEX deleted_rows_deleted_at_idx ON deleted_rows (deleted_at);
+
+CREATE OR REPLACE FUNCTION touch_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = now();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION record_deleted_row()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO deleted_rows (table_name, row_id) VALUES (TG_TABLE_NAME, OLD.id);
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Also fires for the ON DELETE SET NULL on users.team_id when a team is deleted
+CREATE TRIGGER users_touch_updated_at BEFORE UPDATE ON users FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+CREATE TRIGGER teams_touch_updated_at BEFORE UPDATE ON teams FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+CREATE TRIGGER users_record_deleted_row AFTER DELETE ON users FOR EACH ROW EXECUTE FUNCTION record_deleted_row();
+CREATE TRIGGER teams_record_deleted_row AFTER DELETE ON teams FOR EACH ROW EXECUTE FUNCTION record_deleted_row();
+
 CREATE TABLE team_invites (
     id SERIAL PRIMARY KEY,
     team_id INTEGER REFERENCES teams(id) ON DELETE CASCADE,
     user_id BIGINT NOT NULL REFERENCES users(discord_id) ON DELETE CASCADE,
     invited_by BIGINT NOT NULL REFERENCES users(discord_id) ON DELETE CASCADE,
-    status TEXT CHECK (status IN ('pending', 'accepted', 'declined')) DEFAULT 'pending',
+    status TEXT CHECK (status IN ('pending', 'accepted', 'declined', 'expired')) DEFAULT 'pending',
+    channel_id BIGINT,
+    message_id BIGINT,
     created_at TIMESTAMP DEFAULT now(),
+    expires_at TIMESTAMP DEFAULT now() + INTERVAL '48 hours',
+    resolved_at TIMESTAMP,
     UNIQUE (team_id, user_id)
 );
 
-CREATE OR REPLACE FUNCTION invite_user_to_team(inviter_id BIGINT, invitee_id BIGINT)
-RETURNS VOID AS $$
-BEGIN
-    INSERT INTO team_invites (team_id, user_id)
-    SELECT team_id, invitee_id
+-- Only pending invites are looked up by invitee (autocomplete) or by expiry (the sweeper), so these indexes stay as
+-- small as the set of open invites no matter how many resolved invites pile up
+CREATE INDEX team_invites_pending_user_idx ON team_invites (user_id, expires_at) WHERE status = 'pending';
+CREATE INDEX team_invites_pending_expiry_idx ON team_invites (expires_at) WHERE status = 'pending';
+CREATE INDEX team_invites_resolved_idx ON team_invites (resolved_at) WHERE status <> 'pending';
+
+-- Resolved invites are moved here by the sweeper once they are past their retention period
+CREATE TABLE team_invites_archive (LIKE team_invites INCLUDING DEFAULTS);
+
+DROP FUNCTION IF EXISTS invite_user_to_team(BIGINT, BIGINT);
+CREATE OR REPLACE FUNCTION invite_user_to_team(inviter_id BIGINT, invitee_id BIGINT, invite_ttl_seconds INTEGER DEFAULT 172800)
+RETURNS SETOF team_invites AS $$
+    -- Re-inviting someone who declined or let an invite expire reopens the existing row
+    INSERT INTO team_invites (team_id, user_id, invited_by, expires_at)
+    SELECT team_id, invitee_id, inviter_id, now() + make_interval(secs => invite_ttl_seconds)
     FROM users
-    WHERE discord_id = inviter_id
-    LIMIT 1;
-END;
-$$ LANGUAGE plpgsql;
+    WHERE discord_id = inviter_id AND team_id IS NOT NULL
+    LIMIT 1
+    ON CONFLICT (team_id, user_id) DO UPDATE
+    SET invited_by = EXCLUDED.invited_by,
+        status = 'pending',
+        channel_id = NULL,
+        message_id = NULL,
+        created_at = now(),
+        expires_at = EXCLUDED.expires_at,
+        resolved_at = NULL
+    RETURNING *;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION resolve_team_invite(p_team_id INTEGER, p_user_id BIGINT, p_status TEXT)
+RETURNS SETOF team_invites AS $$
+    UPDATE team_invites
+    SET status = p_status, resolved_at = now()
+    WHERE team_id = p_team_id AND user_id = p_user_id AND status = 'pending' AND expires_at > now()
+    RETURNING *;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION expire_team_invites(batch_size INTEGER)
+RETURNS SETOF team_invites AS $$
+    UPDATE team_invites
+    SET status = 'expired', resolved_at = now()
+    WHERE id IN (
+        SELECT id
+        FROM team_invites
+        WHERE status = 'pending' AND expires_at <= now()
+        ORDER BY expires_at
+        LIMIT batch_size
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING *;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION archive_team_invites(retention_seconds INTEGER, batch_size INTEGER)
+RETURNS INTEGER AS $$
+    WITH archived AS (
+        DELETE FROM team_invites
+        WHERE id IN (
+            SELECT id
+            FROM team_invites
+            WHERE status <> 'pending' AND resolved_at <= now() - make_interval(secs => retention_seconds)
+            ORDER BY resolved_at
+            LIMIT batch_size
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING *
+    ), moved AS (
+        INSERT INTO team_invites_archive
+        SELECT * FROM archived
+        RETURNING 1
+    )
+    SELECT count(*)::INTEGER FROM moved;
+$$ LANGUAGE sql;
 
 CREATE OR REPLACE FUNCTION fetch_teams_with_counts()
 RETURNS TABLE (
@@ -97,6 +200,6 @@ BEGIN
     SELECT t.*
     FROM teams t
     JOIN team_invites ti ON t.id = ti.team_id
-    WHERE ti.user_id = member_id AND ti.status = 'pending';
+    WHERE ti.user_id = member_id AND ti.status = 'pending' AND ti.expires_at > now();
 END;
 $$ LANGUAGE plpgsql;
@@ -0,0 +1 @@
+from .simulator import MemberOption, Simulator, SimulatorOptions
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+
+from loadsim.scenarios import autocomplete_storm, join_storm, team_storm
+from loadsim.simulator import Simulator, SimulatorOptions
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog='python -m loadsim', description="Load test the bot against simulated Discord and Supabase backends.")
+    parser.add_argument('--db-latency', type=float, default=0.05, help="Base Supabase latency in seconds")
+    parser.add_argument('--db-jitter', type=float, default=0.05, help="Extra random Supabase latency in seconds")
+    parser.add_argument('--db-pool-size', type=int, default=20, help="Maximum concurrent Supabase requests")
+    parser.add_argument('--db-rps', type=float, default=None, help="Supabase requests per second before throttling")
+    parser.add_argument('--discord-latency', type=float, default=0.08, help="Base Discord API latency in seconds")
+    parser.add_argument('--discord-jitter', type=float, default=0.04, help="Extra random Discord API latency in seconds")
+    parser.add_argument('--bucket-limit', type=int, default=10, help="Requests allowed per Discord route bucket and period")
+    parser.add_argument('--bucket-period', type=float, default=10.0, help="Discord route bucket period in seconds")
+    parser.add_argument('--global-limit', type=int, default=50, help="Discord global requests per second")
+    parser.add_argument('--dm-closed-ratio', type=float, default=0.05, help="Fraction of users with DMs disabled")
+    parser.add_argument('--deadline', type=float, default=3.0, help="Interaction response deadline in seconds")
+    parser.add_argument('--invite-ttl', type=float, default=None, help="Team invite lifetime in seconds (defaults to the bot's)")
+    parser.add_argument('--tracemalloc', action='store_true', help="Measure peak memory with tracemalloc (slower)")
+    parser.add_argument('--verbose', action='store_true', help="Show the bot's own log output")
+
+    subparsers = parser.add_subparsers(dest='scenario', required=True)
+
+    join = subparsers.add_parser('join-storm', help="Many members joining the server")
+    join.add_argument('--joins', type=int, default=2000)
+    join.add_argument('--duration', type=float, default=300.0)
+    join.add_argument('--registered-ratio', type=float, default=0.9)
+
+    team = subparsers.add_parser('team-storm', help="Users creating and joining teams concurrently")
+    team.add_argument('--users', type=int, default=500)
+    team.add_argument('--duration', type=float, default=60.0)
+
+    autocomplete = subparsers.add_parser('autocomplete-storm', help="Many autocomplete requests at once")
+    autocomplete.add_argument('--users', type=int, default=500)
+    autocomplete.add_argument('--requests', type=int, default=5000)
+    autocomplete.add_argument('--duration', type=float, default=30.0)
+    return parser.parse_args()
+
+async def main() -> None:
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL, format='[{asctime}] [{levelname:<8}] {name}: {message}', style='{')
+
+    sim = Simulator(SimulatorOptions(
+        db_latency=args.db_latency,
+        db_jitter=args.db_jitter,
+        db_pool_size=args.db_pool_size,
+        db_requests_per_second=args.db_rps,
+        discord_latency=args.discord_latency,
+        discord_jitter=args.discord_jitter,
+        bucket_limit=args.bucket_limit,
+        bucket_period=args.bucket_period,
+        global_limit=args.global_limit,
+        dm_closed_ratio=args.dm_closed_ratio,
+        deadline=args.deadline,
+        trace_memory=args.tracemalloc,
+        invite_ttl=args.invite_ttl,
+    ))
+
+    if args.scenario == 'join-storm':
+        await join_storm(sim, args.joins, args.duration, args.registered_ratio)
+    elif args.scenario == 'team-storm':
+        await team_storm(sim, args.users, args.duration)
+    else:
+        await autocomplete_storm(sim, args.users, args.requests, args.duration)
+
+    elapsed = await sim.close()
+    print(sim.report(args.scenario, elapsed))
+
+asyncio.run(main())
@@ -0,0 +1,642 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import contextlib
+import contextvars
+import copy
+import datetime
+import itertools
+import json
+import random
+import time
+
+import discord
+
+from discord.webhook.async_ import AsyncWebhookAdapter
+from multidict import CIMultiDict
+from postgrest import APIError
+
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable
+
+if TYPE_CHECKING:
+    from discord.http import Route
+
+def utcnow_iso(offset: float = 0.0) -> str:
+    return (datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=offset)).isoformat()
+
+class Latency:
+    def __init__(self, base: float, jitter: float = 0.0) -> None:
+        self.base = base
+        self.jitter = jitter
+
+    async def wait(self) -> None:
+        delay = self.base + random.uniform(0, self.jitter) if self.jitter else self.base
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+class TokenBucket:
+    def __init__(self, limit: int, period: float) -> None:
+        self.limit = limit
+        self.period = period
+        self.calls: collections.deque[float] = collections.deque()
+
+    def retry_after(self) -> float:
+        now = time.perf_counter()
+        while self.calls and now - self.calls[0] >= self.period:
+            self.calls.popleft()
+        if len(self.calls) < self.limit:
+            return 0.0
+        return self.period - (now - self.calls[0])
+
+    def consume(self) -> None:
+        self.calls.append(time.perf_counter())
+
+# Discord's buckets: `limit` requests per window, and the window resets `period` seconds after its first request
+class RateLimitWindow:
+    def __init__(self, limit: int, period: float) -> None:
+        self.limit = limit
+        self.period = period
+        self.started = 0.0
+        self.count = 0
+
+    def reset_after(self) -> float:
+        now = time.perf_counter()
+        if now - self.started >= self.period:
+            self.started, self.count = now, 0
+        return self.period - (now - self.started)
+
+    def retry_after(self) -> float:
+        reset_after = self.reset_after()
+        return reset_after if self.count >= self.limit else 0.0
+
+    def remaining(self) -> int:
+        self.reset_after()
+        return self.limit - self.count
+
+    def consume(self) -> None:
+        self.reset_after()
+        self.count += 1
+
+# Supabase
+
+class FakeResponse:
+    def __init__(self, data: list[dict[str, Any]]) -> None:
+        self.data = data
+
+class FakeQuery:
+    def __init__(self, client: FakeSupabase, table: str | None, rpc: str | None = None, params: dict[str, Any] | None = None) -> None:
+        self.client = client
+        self.table_name = table
+        self.rpc_name = rpc
+        self.params = params or {}
+        self.action = 'select'
+        self.values: dict[str, Any] = {}
+        self.filters: list[Callable[[dict[str, Any]], bool]] = []
+        self.equals: dict[str, Any] = {}
+        self.order_by: tuple[str, bool] | None = None
+        self.row_limit: int | None = None
+        self.columns = '*'
+
+    def select(self, columns: str = '*', **_: Any) -> FakeQuery:
+        self.columns = columns
+        return self
+
+    def insert(self, values: dict[str, Any]) -> FakeQuery:
+        self.action = 'insert'
+        self.values = values
+        return self
+
+    def update(self, values: dict[str, Any]) -> FakeQuery:
+        self.action = 'update'
+        self.values = values
+        return self
+
+    def delete(self) -> FakeQuery:
+        self.action = 'delete'
+        return self
+
+    def eq(self, column: str, value: Any) -> FakeQuery:
+        self.equals.setdefault(column, value)
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def neq(self, column: str, value: Any) -> FakeQuery:
+        self.filters.append(lambda row: row.get(column) != value)
+        return self
+
+    def gt(self, column: str, value: Any) -> FakeQuery:
+        self.filters.append(lambda row: row.get(column) is not None and row[column] > value)
+        return self
+
+    def gte(self, column: str, value: Any) -> FakeQuery:
+        self.filters.append(lambda row: row.get(column) is not None and row[column] >= value)
+        return self
+
+    def lt(self, column: str, value: Any) -> FakeQuery:
+        self.filters.append(lambda row: row.get(column) is not None and row[column] < value)
+        return self
+
+    def in_(self, column: str, values: list[Any]) -> FakeQuery:
+        allowed = set(values)
+        self.filters.append(lambda row: row.get(column) in allowed)
+        return self
+
+    def is_(self, column: str, value: Any) -> FakeQuery:
+        expected = None if value in (None, 'null') else value
+        self.filters.append(lambda row: row.get(column) is expected)
+        return self
+
+    def order(self, column: str, *, desc: bool = False, **_: Any) -> FakeQuery:
+        self.order_by = (column, desc)
+        return self
+
+    def limit(self, size: int, **_: Any) -> FakeQuery:
+        self.row_limit = size
+        return self
+
+    def shape(self, rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        rows = [row for row in rows if all(f(row) for f in self.filters)]
+        if self.order_by:
+            column, desc = self.order_by
+            rows.sort(key=lambda row: row[column], reverse=desc)
+        if self.row_limit is not None:
+            rows = rows[:self.row_limit]
+        if self.columns != '*':
+            names = [name.strip() for name in self.columns.split(',')]
+            rows = [{name: row.get(name) for name in names} for row in rows]
+        return [dict(row) for row in rows]
+
+    async def execute(self) -> FakeResponse:
+        async with self.client.pool:
+            await self.client.throttle()
+            await self.client.latency.wait()
+            self.client.queries[self.rpc_name or f'{self.action} {self.table_name}'] += 1
+            if self.rpc_name:
+                result = self.client.call_rpc(self.rpc_name, self.params)
+                # Functions returning a scalar are passed through as is
+                return FakeResponse(self.shape(result) if isinstance(result, list) else result)  # type: ignore
+            return FakeResponse(self.run())
+
+    def candidates(self) -> list[dict[str, Any]]:
+        # Primary and unique key lookups go through an index so the fake stays cheap next to the bot
+        for column in ('id', 'discord_id'):
+            index = self.client.indexes.get((self.table_name, column))  # type: ignore
+            if index is not None and column in self.equals:
+                row = index.get(self.equals[column])
+                return [row] if row is not None else []
+        return self.client.tables[self.table_name]  # type: ignore
+
+    def run(self) -> list[dict[str, Any]]:
+        table = self.candidates()
+        if self.action == 'insert':
+            return [self.client.insert(self.table_name, self.values)]  # type: ignore
+        if self.action == 'update':
+            rows = [row for row in table if all(f(row) for f in self.filters)]
+            for row in rows:
+                self.client.update(self.table_name, row, self.values)  # type: ignore
+            return [dict(row) for row in rows]
+        if self.action == 'delete':
+            rows = [row for row in table if all(f(row) for f in self.filters)]
+            for row in rows:
+                self.client.delete(self.table_name, row)  # type: ignore
+            return [dict(row) for row in rows]
+        return self.shape(table)
+
+class FakeSupabase:
+    UNIQUE = {
+        'users': [('discord_id',)],
+        'teams': [('name',)],
+        'team_invites': [('team_id', 'user_id')],
+    }
+
+    def __init__(self, latency: Latency, pool_size: int = 20, requests_per_second: float | None = None) -> None:
+        self.latency = latency
+        self.pool = asyncio.Semaphore(pool_size)
+        self.bucket = TokenBucket(int(requests_per_second), 1.0) if requests_per_second else None
+        self.tables: dict[str, list[dict[str, Any]]] = {name: [] for name in self.UNIQUE}
+        self.tables['team_invites_archive'] = []
+        self.tables['deleted_rows'] = []
+        self.deleted_row_ids = itertools.count(1)
+        self.ids = {name: itertools.count(1) for name in self.UNIQUE}
+        self.indexes: dict[tuple[str, str], dict[Any, dict[str, Any]]] = {(name, 'id'): {} for name in self.UNIQUE}
+        self.indexes['users', 'discord_id'] = {}
+        self.unique_keys: dict[tuple[str, tuple[str, ...]], set[tuple[Any, ...]]] = {
+            (name, columns): set() for name, keys in self.UNIQUE.items() for columns in keys
+        }
+        self.queries: collections.Counter[str] = collections.Counter()
+        self.throttled = 0
+
+    async def throttle(self) -> None:
+        if self.bucket is None:
+            return
+        if self.bucket.retry_after():
+            self.throttled += 1
+        while retry_after := self.bucket.retry_after():
+            await asyncio.sleep(retry_after)
+        self.bucket.consume()
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def rpc(self, name: str, params: dict[str, Any] | None = None, **_: Any) -> FakeQuery:
+        return FakeQuery(self, None, rpc=name, params=params)
+
+    def unique_key(self, columns: tuple[str, ...], row: dict[str, Any]) -> tuple[Any, ...]:
+        return tuple(row.get(column) for column in columns)
+
+    def check_unique(self, table: str, row: dict[str, Any]) -> None:
+        for columns in self.UNIQUE[table]:
+            if self.unique_key(columns, row) in self.unique_keys[table, columns]:
+                raise APIError({'message': f'duplicate key value violates unique constraint "{table}_{"_".join(columns)}_key"', 'code': '23505'})
+
+    def index(self, table: str, row: dict[str, Any], add: bool) -> None:
+        for columns in self.UNIQUE[table]:
+            keys = self.unique_keys[table, columns]
+            if add:
+                keys.add(self.unique_key(columns, row))
+            else:
+                keys.discard(self.unique_key(columns, row))
+        for (index_table, column), index in self.indexes.items():
+            if index_table == table:
+                if add:
+                    index[row[column]] = row
+                else:
+                    index.pop(row[column], None)
+
+    def insert(self, table: str, values: dict[str, Any]) -> dict[str, Any]:
+        now = utcnow_iso()
+        row = {'id': next(self.ids[table]), 'created_at': now, 'updated_at': now}
+        if table == 'users':
+            row.update({'about': None, 'team_id': None, 'shsm_sector': 'None'})
+        elif table == 'team_invites':
+            row.update({'status': 'pending', 'invited_by': None, 'channel_id': None, 'message_id': None, 'expires_at': utcnow_iso(172800), 'resolved_at': None})
+        row.update(copy.deepcopy(values))
+        self.check_unique(table, row)
+        self.tables[table].append(row)
+        self.index(table, row, add=True)
+        return dict(row)
+
+    def update(self, table: str, row: dict[str, Any], values: dict[str, Any]) -> None:
+        self.index(table, row, add=False)
+        try:
+            self.check_unique(table, {**row, **values})
+        except APIError:
+            self.index(table, row, add=True)
+            raise
+        row.update(values)
+        row['updated_at'] = utcnow_iso()
+        self.index(table, row, add=True)
+
+    def delete(self, table: str, row: dict[str, Any]) -> None:
+        self.tables[table].remove(row)
+        self.index(table, row, add=False)
+        if table in ('users', 'teams'):
+            self.tables['deleted_rows'].append({'id': next(self.deleted_row_ids), 'table_name': table, 'row_id': row['id'], 'deleted_at': utcnow_iso()})
+        if table == 'teams':
+            # ON DELETE SET NULL / CASCADE
+            for user in self.tables['users']:
+                if user['team_id'] == row['id']:
+                    self.update('users', user, {'team_id': None})
+            for invite in [invite for invite in self.tables['team_invites'] if invite['team_id'] == row['id']]:
+                self.delete('team_invites', invite)
+
+    def pending_invites(self) -> list[dict[str, Any]]:
+        return [invite for invite in self.tables['team_invites'] if invite['status'] == 'pending']
+
+    def teams_with_counts(self) -> list[dict[str, Any]]:
+        counts = collections.Counter(user['team_id'] for user in self.tables['users'] if user['team_id'] is not None)
+        return [{**team, 'member_count': counts[team['id']]} for team in self.tables['teams']]
+
+    def call_rpc(self, name: str, params: dict[str, Any]) -> list[dict[str, Any]] | int:
+        if name == 'fetch_teams_with_counts':
+            return self.teams_with_counts()
+        if name == 'fetch_team_with_count':
+            return [team for team in self.teams_with_counts() if team['id'] == params['p_team_id']]
+        if name == 'fetch_pending_invites':
+            now = utcnow_iso()
+            team_ids = {invite['team_id'] for invite in self.pending_invites() if invite['user_id'] == params['member_id'] and invite['expires_at'] > now}
+            return [team for team in self.tables['teams'] if team['id'] in team_ids]
+        if name == 'invite_user_to_team':
+            inviter = self.indexes['users', 'discord_id'].get(params['inviter_id'])
+            if inviter is None or inviter['team_id'] is None:
+                return []
+            values = {
+                'team_id': inviter['team_id'],
+                'user_id': params['invitee_id'],
+                'invited_by': params['inviter_id'],
+                'expires_at': utcnow_iso(params.get('invite_ttl_seconds', 172800)),
+            }
+            existing = next((invite for invite in self.tables['team_invites'] if invite['team_id'] == values['team_id'] and invite['user_id'] == values['user_id']), None)
+            if existing is None:
+                return [self.insert('team_invites', values)]
+            self.update('team_invites', existing, {**values, 'status': 'pending', 'channel_id': None, 'message_id': None, 'created_at': utcnow_iso(), 'resolved_at': None})
+            return [dict(existing)]
+        if name == 'resolve_team_invite':
+            now = utcnow_iso()
+            invites = [
+                invite for invite in self.pending_invites()
+                if invite['team_id'] == params['p_team_id'] and invite['user_id'] == params['p_user_id'] and invite['expires_at'] > now
+            ]
+            for invite in invites:
+                self.update('team_invites', invite, {'status': params['p_status'], 'resolved_at': now})
+            return [dict(invite) for invite in invites]
+        if name == 'expire_team_invites':
+            now = utcnow_iso()
+            invites = sorted((invite for invite in self.pending_invites() if invite['expires_at'] <= now), key=lambda invite: invite['expires_at'])
+            for invite in invites[:params['batch_size']]:
+                self.update('team_invites', invite, {'status': 'expired', 'resolved_at': now})
+            return [dict(invite) for invite in invites[:params['batch_size']]]
+        if name == 'archive_team_invites':
+            cutoff = utcnow_iso(-params['retention_seconds'])
+            invites = [invite for invite in self.tables['team_invites'] if invite['status'] != 'pending' and invite['resolved_at'] <= cutoff]
+            for invite in invites[:params['batch_size']]:
+                self.delete('team_invites', invite)
+                self.tables['team_invites_archive'].append(invite)
+            return len(invites[:params['batch_size']])  # type: ignore
+        raise APIError({'message': f'Could not find the function public.{name}', 'code': 'PGRST202'})
+
+# Discord
+
+class FakeHTTPResponse:
+    status = 403
+    reason = 'Forbidden'
+
+# Stands in for aiohttp's ClientResponse in discord.py's HTTPClient.request
+class FakeClientResponse:
+    REASONS = {200: 'OK', 204: 'No Content', 403: 'Forbidden', 404: 'Not Found', 429: 'Too Many Requests'}
+
+    def __init__(self, status: int, data: Any, headers: dict[str, str] | None = None) -> None:
+        self.status = status
+        self.reason = self.REASONS.get(status, 'Bad Request')
+        self.headers: CIMultiDict[str] = CIMultiDict(headers or {})
+        if data is None:
+            self.body = ''
+        else:
+            self.body = json.dumps(data)
+            self.headers['Content-Type'] = 'application/json'
+
+    async def text(self, encoding: str = 'utf-8') -> str:
+        return self.body
+
+# Stands in for the aiohttp session that discord.py's HTTPClient sends every request through, so its own rate limit
+# handling (bucket headers, pre-emptive waits and retrying 429s) runs against the simulated limits
+class FakeClientSession:
+    def __init__(self, discord_: FakeDiscord) -> None:
+        self.discord = discord_
+        self.closed = False
+
+    def request(self, method: str, url: str, **_: Any) -> contextlib.AbstractAsyncContextManager[FakeClientResponse]:
+        return self.discord.respond()
+
+    async def close(self) -> None:
+        self.closed = True
+
+class FakeDiscord:
+    def __init__(
+        self,
+        latency: Latency,
+        bucket_limit: int = 10,
+        bucket_period: float = 10.0,
+        global_limit: int = 50,
+        dm_closed_ratio: float = 0.0,
+    ) -> None:
+        self.latency = latency
+        self.bucket_limit = bucket_limit
+        self.bucket_period = bucket_period
+        self.global_bucket = RateLimitWindow(global_limit, 1.0)
+        self.buckets: dict[str, RateLimitWindow] = {}
+        self.dm_closed_ratio = dm_closed_ratio
+
+        self.state: discord.state.ConnectionState = None  # type: ignore
+        self.bot_user: dict[str, Any] = {}
+        self.snowflakes = itertools.count(discord.utils.time_snowflake(discord.utils.utcnow()))
+        self.dm_channels: dict[int, int] = {}
+        self.dms_closed: set[int] = set()
+        self.responses: dict[int, float] = {}
+        self.response_waiters: dict[int, asyncio.Future[float]] = {}
+        self.dm_components: dict[int, list[tuple[int, dict[str, Any]]]] = collections.defaultdict(list)
+
+        self.requests: collections.Counter[str] = collections.Counter()
+        self.rate_limited: collections.Counter[str] = collections.Counter()
+        # The route and arguments of the request HTTPClient.request is sending in the current task
+        self.current_request: contextvars.ContextVar[tuple[Route, dict[str, Any]]] = contextvars.ContextVar('current_request')
+
+    def snowflake(self) -> int:
+        return next(self.snowflakes)
+
+    def attach(self, state: discord.state.ConnectionState, bot_user: dict[str, Any]) -> None:
+        self.state = state
+        self.bot_user = bot_user
+        # The real HTTPClient.request still runs; it only needs the Route, which the session it calls never sees
+        request = state.http.request
+
+        async def remember_route(route: Route, **kwargs: Any) -> Any:
+            self.current_request.set((route, kwargs))
+            return await request(route, **kwargs)
+
+        state.http.request = remember_route  # type: ignore
+        # What HTTPClient.static_login would set up against the real gateway
+        state.http._HTTPClient__session = FakeClientSession(self)  # type: ignore
+        state.http._global_over = asyncio.Event()
+        state.http._global_over.set()
+
+    def webhook_adapter(self) -> AsyncWebhookAdapter:
+        adapter = AsyncWebhookAdapter()
+        adapter.request = self.webhook_request  # type: ignore
+        return adapter
+
+    def wait_for_response(self, interaction_id: int) -> asyncio.Future[float]:
+        future = asyncio.get_running_loop().create_future()
+        if interaction_id in self.responses:
+            future.set_result(self.responses[interaction_id])
+        else:
+            self.response_waiters[interaction_id] = future
+        return future
+
+    @contextlib.asynccontextmanager
+    async def respond(self) -> AsyncIterator[FakeClientResponse]:
+        route, kwargs = self.current_request.get()
+        self.requests[route.key] += 1
+        await self.latency.wait()
+
+        key = f'{route.key}:{route.major_parameters}'
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = RateLimitWindow(self.bucket_limit, self.bucket_period)
+
+        if (retry_after := max(self.global_bucket.retry_after(), bucket.retry_after())) > 0:
+            self.rate_limited[route.key] += 1
+            is_global = self.global_bucket.retry_after() > 0
+            # discord.py treats a 429 without Via as a Cloudflare ban
+            yield FakeClientResponse(429, {'message': 'You are being rate limited.', 'retry_after': retry_after, 'global': is_global}, {'Via': '1.1 google'})
+            return
+
+        self.global_bucket.consume()
+        bucket.consume()
+        headers = {
+            'X-Ratelimit-Bucket': route.key,
+            'X-Ratelimit-Limit': str(bucket.limit),
+            'X-Ratelimit-Remaining': str(bucket.remaining()),
+            'X-Ratelimit-Reset-After': f'{bucket.reset_after():.3f}',
+        }
+        try:
+            data = await self.bot_request(route, **kwargs)
+        except discord.HTTPException as e:
+            yield FakeClientResponse(e.status, {'code': e.code, 'message': e.text}, headers)
+            return
+        yield FakeClientResponse(200 if data is not None else 204, data, headers)
+
+    def message_payload(self, channel_id: int, payload: dict[str, Any] | None, author: dict[str, Any] | None = None) -> dict[str, Any]:
+        payload = payload or {}
+        return {
+            'id': str(self.snowflake()),
+            'channel_id': str(channel_id),
+            'author': author or self.bot_user,
+            'content': payload.get('content') or '',
+            'timestamp': utcnow_iso(),
+            'edited_timestamp': None,
+            'tts': False,
+            'mention_everyone': False,
+            'mentions': [],
+            'mention_roles': [],
+            'attachments': [],
+            'embeds': payload.get('embeds') or [],
+            'components': payload.get('components') or [],
+            'pinned': False,
+            'type': 0,
+            'flags': payload.get('flags', 0),
+        }
+
+    @staticmethod
+    def request_payload(kwargs: dict[str, Any]) -> dict[str, Any] | None:
+        if kwargs.get('json') is not None:
+            return kwargs['json']
+        if kwargs.get('payload') is not None:
+            return kwargs['payload']
+        for part in kwargs.get('form') or kwargs.get('multipart') or []:
+            if part.get('name') == 'payload_json':
+                return json.loads(part['value'])
+        return None
+
+    async def bot_request(self, route: Route, **kwargs: Any) -> Any:
+        payload = self.request_payload(kwargs)
+
+        if route.key == 'POST /users/@me/channels':
+            user_id = int(payload['recipient_id'])  # type: ignore
+            channel_id = self.dm_channels.setdefault(user_id, self.snowflake())
+            user = self.state.get_user(user_id)
+            recipient = {'id': str(user_id), 'username': user.name if user else str(user_id), 'discriminator': '0', 'avatar': None, 'global_name': None}
+            return {'id': str(channel_id), 'type': 1, 'recipients': [recipient], 'last_message_id': None}
+
+        if route.key == 'POST /channels/{channel_id}/messages':
+            channel_id = int(route.channel_id)  # type: ignore
+            recipient_id = next((user_id for user_id, dm_id in self.dm_channels.items() if dm_id == channel_id), None)
+            if recipient_id is not None and recipient_id in self.dms_closed:
+                raise discord.Forbidden(FakeHTTPResponse(), {'code': 50007, 'message': 'Cannot send messages to this user'})  # type: ignore
+            message = self.message_payload(channel_id, payload)
+            if recipient_id is not None and message['components']:
+                self.dm_components[recipient_id].append((int(message['id']), message))
+            return message
+
+        if route.key == 'PATCH /channels/{channel_id}/messages/{message_id}':
+            # Route only keeps the major parameters, so the message id comes from the url
+            channel_id, message_id = int(route.channel_id), int(route.url.rsplit('/', 1)[1])  # type: ignore
+            message = {**self.message_payload(channel_id, payload), 'id': str(message_id)}
+            # Keep the recipient's copy current so later clicks see disabled buttons
+            for messages in self.dm_components.values():
+                for i, (stored_id, _) in enumerate(messages):
+                    if stored_id == message_id:
+                        messages[i] = (message_id, message)
+            return message
+
+        if route.key == 'PATCH /guilds/{guild_id}/members/{user_id}':
+            return self.update_member(route, payload or {})
+
+        if route.key in ('PUT /guilds/{guild_id}/members/{user_id}/roles/{role_id}', 'DELETE /guilds/{guild_id}/members/{user_id}/roles/{role_id}'):
+            guild_id, user_id, role_id = (int(part) for part in route.url.split('/guilds/')[1].split('/')[::2][:3])
+            member = self.state._get_guild(guild_id).get_member(user_id)  # type: ignore
+            roles = {role.id for role in member.roles[1:]} if member else set()
+            if route.method == 'PUT':
+                roles.add(role_id)
+            else:
+                roles.discard(role_id)
+            self.echo_member_update(guild_id, user_id, {'roles': [str(role) for role in roles]})
+            return None
+
+        return None
+
+    def update_member(self, route: Route, payload: dict[str, Any]) -> dict[str, Any]:
+        guild_id = int(route.guild_id)  # type: ignore
+        user_id = int(route.url.rsplit('/', 1)[1])
+        return self.echo_member_update(guild_id, user_id, payload)
+
+    def echo_member_update(self, guild_id: int, user_id: int, changes: dict[str, Any]) -> dict[str, Any]:
+        guild = self.state._get_guild(guild_id)
+        member = guild and guild.get_member(user_id)
+        data = {
+            'guild_id': str(guild_id),
+            'user': {'id': str(user_id), 'username': member.name if member else str(user_id), 'discriminator': '0', 'avatar': None, 'global_name': None},
+            'roles': [str(role.id) for role in member.roles[1:]] if member else [],
+            'nick': member.nick if member else None,
+            'joined_at': utcnow_iso(),
+            'deaf': False,
+            'mute': False,
+            'flags': 0,
+        }
+        if 'roles' in changes:
+            data['roles'] = [str(role) for role in changes['roles']]
+        if 'nick' in changes:
+            data['nick'] = changes['nick']
+        # Discord echoes member changes back over the gateway
+        self.state.parse_guild_member_update(data)  # type: ignore
+        return data
+
+    async def webhook_request(self, route: Route, **kwargs: Any) -> Any:
+        self.requests[route.key] += 1
+        await self.latency.wait()
+        payload = self.request_payload(kwargs)
+
+        if route.key == 'POST /interactions/{webhook_id}/{webhook_token}/callback':
+            interaction_id = int(route.webhook_id)  # type: ignore
+            now = time.perf_counter()
+            self.responses[interaction_id] = now
+            if waiter := self.response_waiters.pop(interaction_id, None):
+                waiter.set_result(now)
+
+            response_type = payload['type'] if payload else 5
+            data = payload.get('data') or {} if payload else {}
+            result: dict[str, Any] = {'interaction': {'id': str(interaction_id), 'type': 2, 'response_message_loading': response_type == 5}}
+            if response_type == 4:
+                result['resource'] = {'type': 4, 'message': self.message_payload(0, data)}
+            elif response_type in (5, 6, 7):
+                result['resource'] = {'type': response_type}
+            return result
+
+        if route.method in ('POST', 'PATCH', 'GET') and route.path.startswith('/webhooks/'):
+            return self.message_payload(0, payload)
+
+        return None
+
+def member_payload(user_id: int, username: str, roles: list[int] | None = None) -> dict[str, Any]:
+    return {
+        'user': {'id': str(user_id), 'username': username, 'discriminator': '0', 'avatar': None, 'global_name': None},
+        'roles': [str(role) for role in roles or []],
+        'nick': None,
+        'joined_at': utcnow_iso(),
+        'deaf': False,
+        'mute': False,
+        'flags': 0,
+    }
+
+def fake_config(guild_id: int, log_channel_id: int, unverified_role_id: int, hacker_role_id: int) -> dict[str, Any]:
+    return {
+        'bot': {
+            'guild_id': guild_id,
+            'log_channel_id': log_channel_id,
+            'unverified_role_id': unverified_role_id,
+            'hacker_role_id': hacker_role_id,
+            'sync_guild_commands': False,
+        },
+        'embeds': {'info_color': '0x7b3cc3', 'success_color': '0x3cc352', 'error_color': '0xc33c3c'},
+    }
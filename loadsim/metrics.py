@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import resource
+import sys
+import time
+import tracemalloc
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+class LatencyStats:
+    def __init__(self) -> None:
+        self.samples: dict[str, list[float]] = collections.defaultdict(list)
+        self.errors: collections.Counter[str] = collections.Counter()
+        self.deadline_misses: collections.Counter[str] = collections.Counter()
+
+    def record(self, name: str, latency: float) -> None:
+        self.samples[name].append(latency)
+
+    def rows(self) -> list[tuple[str, int, float, float, float, int, int]]:
+        return [
+            (name, len(values), percentile(values, 0.5), percentile(values, 0.99), max(values), self.deadline_misses[name], self.errors[name])
+            for name, values in sorted(self.samples.items())
+        ]
+
+class LoopLagMonitor:
+    def __init__(self, interval: float = 0.01) -> None:
+        self.interval = interval
+        self.lags: list[float] = []
+        self.task: asyncio.Task[None] | None = None
+
+    async def run(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, time.perf_counter() - start - self.interval))
+
+    def start(self) -> None:
+        self.task = asyncio.create_task(self.run(), name='loadsim-loop-lag')
+
+    def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+
+class MemoryMonitor:
+    def __init__(self, trace: bool) -> None:
+        self.trace = trace
+
+    def start(self) -> None:
+        if self.trace:
+            tracemalloc.start()
+
+    def peak_bytes(self) -> int:
+        if self.trace:
+            return tracemalloc.get_traced_memory()[1]
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+def format_report(scenario: str, elapsed: float, stats: LatencyStats, loop: LoopLagMonitor, memory: MemoryMonitor, extra: dict[str, object]) -> str:
+    lines = [f"Scenario {scenario} finished in {elapsed:.1f}s", '']
+    lines.append(f"{'name':<32} {'count':>7} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9} {'missed':>7} {'errors':>7}")
+    for name, count, p50, p99, worst, missed, errors in stats.rows():
+        lines.append(f"{name:<32} {count:>7} {p50 * 1000:>9.1f} {p99 * 1000:>9.1f} {worst * 1000:>9.1f} {missed:>7} {errors:>7}")
+
+    lines.append('')
+    lines.append(
+        f"event loop lag: p50 {percentile(loop.lags, 0.5) * 1000:.1f}ms, "
+        f"p99 {percentile(loop.lags, 0.99) * 1000:.1f}ms, max {max(loop.lags, default=0.0) * 1000:.1f}ms"
+    )
+    source = 'tracemalloc' if memory.trace else 'max rss'
+    lines.append(f"peak memory ({source}): {memory.peak_bytes() / 1024 / 1024:.1f} MiB")
+    for key, value in extra.items():
+        lines.append(f"{key}: {value}")
+    return '\n'.join(lines)
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import asyncio
+import random
+
+from loadsim.simulator import MemberOption, Simulator
+
+from typing import Awaitable, Callable
+
+async def spread(count: int, duration: float, factory: Callable[[int], Awaitable[None]]) -> None:
+    # Start `count` jobs uniformly over `duration` seconds and wait for all of them
+    async def delayed(i: int) -> None:
+        await asyncio.sleep(duration * i / max(count, 1))
+        await factory(i)
+
+    await asyncio.gather(*(delayed(i) for i in range(count)))
+
+async def join_storm(sim: Simulator, joins: int, duration: float, registered_ratio: float) -> None:
+    user_ids = sim.create_users(joins, registered_ratio)
+    await sim.start(user_ids)
+    await spread(joins, duration, lambda i: sim.join(user_ids[i]))
+    # Let queued member edits drain so they are part of the run
+    while sim.bot.member_edits.pending:
+        await asyncio.sleep(0.1)
+
+async def team_storm(sim: Simulator, users: int, duration: float) -> None:
+    user_ids = sim.create_users(users)
+    await sim.start(user_ids)
+    sim.seed_members(user_ids)
+
+    async def form_team(i: int) -> None:
+        owner, *invitees = user_ids[i * 4:i * 4 + 4]
+        await sim.command(owner, 'team', 'create', name=f'team{i}')
+        await sim.command(owner, 'team', 'find')
+
+        async def join(invitee: int) -> None:
+            # The invite command returns once the DM and the reply are out, without waiting for an answer
+            await sim.command(owner, 'team', 'invite', member=MemberOption(invitee))
+            # The invitee takes a moment to react to the DM
+            await asyncio.sleep(random.uniform(0.5, 2.0))
+            message = sim.invite_message(invitee)
+            if message is not None and not sim.is_disabled(message, 'Accept'):
+                await sim.click(invitee, message, 'Accept')
+            else:
+                await sim.command(invitee, 'team', 'accept', team=sim.supabase.indexes['users', 'discord_id'][owner]['team_id'] or 0)
+            await sim.command(invitee, 'profile', 'view')
+
+        await asyncio.gather(*(join(invitee) for invitee in invitees))
+        await sim.command(owner, 'team', 'view')
+        await sim.command(owner, 'team', 'viewall')
+
+    await spread(len(user_ids) // 4, duration, form_team)
+
+async def autocomplete_storm(sim: Simulator, users: int, requests: int, duration: float) -> None:
+    user_ids = sim.create_users(users)
+    await sim.start(user_ids)
+    sim.seed_members(user_ids)
+    for i in range(len(user_ids) // 8):
+        sim.seed_team(f'team{i}', user_ids[i * 4:i * 4 + 4])
+
+    prefixes = ['', 't', 'te', 'tea', 'team', 'team1', 'team2', 'team3']
+    autocompletes = [
+        ('team', 'view', 'team'),
+        ('team', 'accept', 'team'),
+        ('team', 'decline', 'team'),
+        ('team', 'kick', 'member'),
+    ]
+
+    async def keystroke(i: int) -> None:
+        group, command, option = random.choice(autocompletes)
+        await sim.autocomplete(random.choice(user_ids), group, command, option, random.choice(prefixes))
+
+    await spread(requests, duration, keystroke)
@@ -0,0 +1,351 @@
+from __future__ import annotations
+
+import asyncio
+import datetime
+import json
+import logging
+import pathlib
+import random
+import tempfile
+import time
+
+import discord
+
+from discord.webhook.async_ import async_context
+
+from loadsim.fakes import FakeDiscord, FakeSupabase, Latency, fake_config, member_payload
+from loadsim.metrics import LatencyStats, LoopLagMonitor, MemoryMonitor, format_report
+from utils import Bot, Config, Database
+
+from typing import Any
+
+logger = logging.getLogger()
+
+class MemberOption:
+    def __init__(self, user_id: int) -> None:
+        self.user_id = user_id
+
+class SimulatorOptions:
+    def __init__(
+        self,
+        db_latency: float = 0.05,
+        db_jitter: float = 0.05,
+        db_pool_size: int = 20,
+        db_requests_per_second: float | None = None,
+        discord_latency: float = 0.08,
+        discord_jitter: float = 0.04,
+        bucket_limit: int = 10,
+        bucket_period: float = 10.0,
+        global_limit: int = 50,
+        dm_closed_ratio: float = 0.05,
+        deadline: float = 3.0,
+        trace_memory: bool = False,
+        invite_ttl: float | None = None,
+    ) -> None:
+        self.db_latency = db_latency
+        self.db_jitter = db_jitter
+        self.db_pool_size = db_pool_size
+        self.db_requests_per_second = db_requests_per_second
+        self.discord_latency = discord_latency
+        self.discord_jitter = discord_jitter
+        self.bucket_limit = bucket_limit
+        self.bucket_period = bucket_period
+        self.global_limit = global_limit
+        self.dm_closed_ratio = dm_closed_ratio
+        self.deadline = deadline
+        self.trace_memory = trace_memory
+        self.invite_ttl = invite_ttl
+
+# Drives the real Bot, cogs and views through simulated gateway events and interactions. Discord's HTTP API and
+# Supabase are replaced by the fakes in loadsim.fakes, everything above them is the production code path.
+class Simulator:
+    def __init__(self, options: SimulatorOptions) -> None:
+        self.options = options
+        self.discord = FakeDiscord(
+            Latency(options.discord_latency, options.discord_jitter),
+            bucket_limit=options.bucket_limit,
+            bucket_period=options.bucket_period,
+            global_limit=options.global_limit,
+        )
+        self.supabase = FakeSupabase(Latency(options.db_latency, options.db_jitter), options.db_pool_size, options.db_requests_per_second)
+        self.stats = LatencyStats()
+        self.loop_lag = LoopLagMonitor()
+        self.memory = MemoryMonitor(options.trace_memory)
+
+        self.guild_id = self.discord.snowflake()
+        self.application_id = self.discord.snowflake()
+        self.log_channel_id = self.discord.snowflake()
+        self.command_channel_id = self.discord.snowflake()
+        self.hacker_role_id = self.discord.snowflake()
+        self.unverified_role_id = self.discord.snowflake()
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.usernames: dict[int, str] = {}
+        self.registered: set[int] = set()
+        self.join_started: dict[int, float] = {}
+        self.join_waiters: dict[int, asyncio.Future[None]] = {}
+        self.bot: Bot = None  # type: ignore
+        self.started_at = 0.0
+
+    @property
+    def state(self) -> Any:
+        return self.bot._connection
+
+    @property
+    def guild(self) -> discord.Guild:
+        return self.bot.get_guild(self.guild_id)  # type: ignore
+
+    def create_users(self, count: int, registered_ratio: float = 1.0) -> list[int]:
+        user_ids = []
+        for _ in range(count):
+            user_id = self.discord.snowflake()
+            self.usernames[user_id] = f'hacker{len(self.usernames)}'
+            if random.random() < registered_ratio:
+                self.registered.add(user_id)
+            if random.random() < self.options.dm_closed_ratio:
+                self.discord.dms_closed.add(user_id)
+            user_ids.append(user_id)
+        return user_ids
+
+    def registration(self, user_id: int) -> dict[str, Any]:
+        rng = random.Random(user_id)
+        return {
+            'discord_username': self.usernames[user_id],
+            'school': rng.choice(['Bayview SS', 'Markville SS', 'Richmond Hill HS', 'Unionville HS']),
+            'grade': rng.choice(['9', '10', '11', '12']),
+            'full_name': f'Hacker {self.usernames[user_id][6:]}',
+            'shsm_sector': rng.choice(['None', 'ICT', 'Business', 'Health and Wellness']),
+        }
+
+    def seed_members(self, user_ids: list[int]) -> None:
+        # Members that joined and were verified before the scenario started
+        for user_id in user_ids:
+            roles = [self.hacker_role_id] if user_id in self.registered else [self.unverified_role_id]
+            self.state.parse_guild_member_update({**member_payload(user_id, self.usernames[user_id], roles), 'guild_id': str(self.guild_id)})
+            if user_id in self.registered:
+                registration = self.registration(user_id)
+                self.supabase.insert('users', {
+                    'discord_id': user_id,
+                    'school': registration['school'],
+                    'grade': registration['grade'],
+                    'shsm_sector': registration['shsm_sector'],
+                    'full_name': registration['full_name'],
+                })
+
+    def seed_team(self, name: str, member_ids: list[int]) -> int:
+        team = self.supabase.insert('teams', {'name': name, 'owner_id': member_ids[0]})
+        for user_id in member_ids:
+            row = self.supabase.indexes['users', 'discord_id'][user_id]
+            self.supabase.update('users', row, {'team_id': team['id']})
+        return team['id']
+
+    def guild_payload(self) -> dict[str, Any]:
+        def role(role_id: int, name: str) -> dict[str, Any]:
+            return {'id': str(role_id), 'name': name, 'color': 0, 'hoist': False, 'position': 0, 'permissions': '0', 'managed': False, 'mentionable': False, 'flags': 0}
+
+        def channel(channel_id: int, name: str) -> dict[str, Any]:
+            return {'id': str(channel_id), 'type': 0, 'name': name, 'position': 0, 'permission_overwrites': [], 'nsfw': False, 'parent_id': None, 'guild_id': str(self.guild_id)}
+
+        return {
+            'id': str(self.guild_id),
+            'name': 'YRHacks (simulated)',
+            'owner_id': str(self.application_id),
+            'roles': [role(self.guild_id, '@everyone'), role(self.hacker_role_id, 'Hacker'), role(self.unverified_role_id, 'Unverified')],
+            'channels': [channel(self.log_channel_id, 'bot-logs'), channel(self.command_channel_id, 'commands')],
+            'members': [],
+            'member_count': 0,
+            'features': [],
+            'emojis': [],
+            'stickers': [],
+        }
+
+    async def start(self, user_ids: list[int]) -> None:
+        registrations = [self.registration(user_id) for user_id in user_ids if user_id in self.registered]
+        registrations_path = pathlib.Path(self.directory.name) / 'registrations.json'
+        registrations_path.write_text(json.dumps(registrations))
+
+        config = Config(fake_config(self.guild_id, self.log_channel_id, self.unverified_role_id, self.hacker_role_id))
+        self.bot = Bot(config, Database(self.supabase), registrations_path, pathlib.Path(self.directory.name) / 'state.snapshot')  # type: ignore
+        if self.options.invite_ttl is not None:
+            # Sweep often enough that invites expire within the run
+            self.bot.invite_sweeper.ttl = datetime.timedelta(seconds=self.options.invite_ttl)
+            self.bot.invite_sweeper.sweep_loop.change_interval(seconds=max(self.options.invite_ttl / 4, 0.1))
+        await self.bot._async_setup_hook()
+
+        bot_user = {'id': str(self.application_id), 'username': 'yrhacks-bot', 'discriminator': '0', 'avatar': None, 'global_name': None, 'bot': True}
+        self.state.user = discord.ClientUser(state=self.state, data=bot_user)  # type: ignore
+        self.state.application_id = self.application_id
+        self.discord.attach(self.state, bot_user)
+        async_context.set(self.discord.webhook_adapter())
+
+        self.state._add_guild_from_data(self.guild_payload())
+        await self.bot.setup_hook()
+
+        on_member_join = self.bot.on_member_join
+
+        async def timed_on_member_join(member: discord.Member) -> None:
+            try:
+                await on_member_join(member)
+            except Exception:
+                logger.exception(f"on_member_join failed for {member}")
+                self.stats.errors['member join'] += 1
+            finally:
+                self.stats.record('member join', time.perf_counter() - self.join_started.pop(member.id))
+                if waiter := self.join_waiters.pop(member.id, None):
+                    waiter.set_result(None)
+
+        self.bot.on_member_join = timed_on_member_join  # type: ignore
+        self.memory.start()
+        self.loop_lag.start()
+        self.started_at = time.perf_counter()
+
+    async def close(self) -> float:
+        elapsed = time.perf_counter() - self.started_at
+        self.loop_lag.stop()
+        await self.bot.close()
+        self.directory.cleanup()
+        return elapsed
+
+    def report(self, scenario: str, elapsed: float) -> str:
+        extra: dict[str, object] = {
+            'database queries': sum(self.supabase.queries.values()),
+            'database throttled': self.supabase.throttled,
+            'discord requests': sum(self.discord.requests.values()),
+            'discord 429s': sum(self.discord.rate_limited.values()),
+            'invites expired': self.bot.invite_sweeper.expired,
+        }
+        for route, count in self.discord.requests.most_common(6):
+            extra[f'  {route}'] = count
+        return format_report(scenario, elapsed, self.stats, self.loop_lag, self.memory, extra)
+
+    # Gateway events
+
+    async def join(self, user_id: int) -> None:
+        waiter = self.join_waiters[user_id] = asyncio.get_running_loop().create_future()
+        self.join_started[user_id] = time.perf_counter()
+        self.state.parse_guild_member_add({**member_payload(user_id, self.usernames[user_id]), 'guild_id': str(self.guild_id)})
+        await waiter
+
+    # Interactions
+
+    def interaction_payload(self, user_id: int, interaction_type: int, data: dict[str, Any], message: dict[str, Any] | None = None) -> dict[str, Any]:
+        interaction_id = self.discord.snowflake()
+        payload: dict[str, Any] = {
+            'id': str(interaction_id),
+            'application_id': str(self.application_id),
+            'type': interaction_type,
+            'token': f'token-{interaction_id}',
+            'version': 1,
+            'data': data,
+            'locale': 'en-US',
+            'entitlements': [],
+            'attachment_size_limit': 8 * 1024 * 1024,
+            'authorizing_integration_owners': {},
+        }
+        if message is None:
+            member = self.guild.get_member(user_id)
+            roles = [role.id for role in member.roles[1:]] if member else []
+            payload['guild_id'] = str(self.guild_id)
+            payload['guild_locale'] = 'en-US'
+            payload['channel'] = {'id': str(self.command_channel_id), 'type': 0, 'guild_id': str(self.guild_id), 'name': 'commands', 'position': 0, 'permission_overwrites': [], 'nsfw': False, 'parent_id': None}
+            payload['member'] = {**member_payload(user_id, self.usernames[user_id], roles), 'permissions': '0'}
+            payload['context'] = 0
+        else:
+            payload['channel'] = {'id': message['channel_id'], 'type': 1}
+            payload['user'] = member_payload(user_id, self.usernames[user_id])['user']
+            payload['message'] = message
+            payload['context'] = 1
+        return payload
+
+    def command_data(self, group: str, command: str, options: dict[str, Any], focused: str | None = None) -> dict[str, Any]:
+        resolved: dict[str, dict[str, Any]] = {'users': {}, 'members': {}}
+        command_options = []
+        for name, value in options.items():
+            if isinstance(value, MemberOption):
+                payload = member_payload(value.user_id, self.usernames[value.user_id])
+                resolved['users'][str(value.user_id)] = payload.pop('user')
+                resolved['members'][str(value.user_id)] = payload
+                option = {'name': name, 'type': 6, 'value': str(value.user_id)}
+            elif isinstance(value, int) and name != focused:
+                option = {'name': name, 'type': 4, 'value': value}
+            else:
+                option = {'name': name, 'type': 3, 'value': str(value)}
+            if name == focused:
+                option['focused'] = True
+            command_options.append(option)
+
+        return {
+            'id': str(self.discord.snowflake()),
+            'name': group,
+            'type': 1,
+            'guild_id': str(self.guild_id),
+            'options': [{'name': command, 'type': 1, 'options': command_options}],
+            'resolved': resolved,
+        }
+
+    def record_response(self, name: str, started: float, response: asyncio.Future[float]) -> None:
+        if not response.done():
+            response.cancel()
+            self.stats.errors[name] += 1
+            return
+        latency = response.result() - started
+        self.stats.record(name, latency)
+        if latency > self.options.deadline:
+            self.stats.deadline_misses[name] += 1
+
+    async def command(self, user_id: int, group: str, command: str, **options: Any) -> None:
+        payload = self.interaction_payload(user_id, 2, self.command_data(group, command, options))
+        interaction = discord.Interaction(data=payload, state=self.state)  # type: ignore
+        name = f'/{group} {command}'
+        response = self.discord.wait_for_response(interaction.id)
+        started = time.perf_counter()
+        try:
+            # The same call CommandTree makes for an INTERACTION_CREATE, awaited so completion can be timed
+            await self.bot.tree._call(interaction)
+        except discord.app_commands.AppCommandError as e:
+            await self.bot.tree._dispatch_error(interaction, e)
+            interaction.command_failed = True
+        except asyncio.CancelledError:
+            # Commands cancelled before they finish still have a response to time
+            self.record_response(f'{name} (ack)', started, response)
+            raise
+        if interaction.command_failed:
+            self.stats.errors[f'{name} (done)'] += 1
+        self.stats.record(f'{name} (done)', time.perf_counter() - started)
+        self.record_response(f'{name} (ack)', started, response)
+
+    async def autocomplete(self, user_id: int, group: str, command: str, option: str, current: str) -> None:
+        payload = self.interaction_payload(user_id, 4, self.command_data(group, command, {option: current}, focused=option))
+        interaction = discord.Interaction(data=payload, state=self.state)  # type: ignore
+        response = self.discord.wait_for_response(interaction.id)
+        started = time.perf_counter()
+        await self.bot.tree._call(interaction)
+        self.record_response(f'/{group} {command} <{option}>', started, response)
+
+    def invite_message(self, user_id: int) -> dict[str, Any] | None:
+        messages = self.discord.dm_components.get(user_id)
+        return messages.pop()[1] if messages else None
+
+    @staticmethod
+    def button(message: dict[str, Any], label: str) -> dict[str, Any]:
+        return next(
+            component
+            for row in message['components']
+            for component in row['components']
+            if component.get('label') == label
+        )
+
+    def is_disabled(self, message: dict[str, Any], label: str) -> bool:
+        return bool(self.button(message, label).get('disabled'))
+
+    async def click(self, user_id: int, message: dict[str, Any], label: str) -> None:
+        button = self.button(message, label)
+        payload = self.interaction_payload(user_id, 3, {'custom_id': button['custom_id'], 'component_type': 2}, message=message)
+        response = self.discord.wait_for_response(int(payload['id']))
+        started = time.perf_counter()
+        self.state.parse_interaction_create(payload)
+        try:
+            await asyncio.wait_for(asyncio.shield(response), timeout=self.options.deadline * 5)
+        except asyncio.TimeoutError:
+            pass
+        self.record_response(f'button {label}', started, response)
@@ -0,0 +1,76 @@
+from utils.cache import NegativeCache
+
+def test_add_caches_a_miss() -> None:
+    cache = NegativeCache(ttl=300, maxsize=10)
+    generation = cache.generation()
+    cache.add(1, since=generation)
+    assert 1 in cache
+
+def test_add_after_discard_is_skipped() -> None:
+    cache = NegativeCache(ttl=300, maxsize=10)
+    generation = cache.generation()
+    # The member is verified while their lookup is in flight
+    cache.discard(1)
+    cache.add(1, since=generation)
+    assert 1 not in cache
+
+def test_discard_of_another_key_does_not_skip_add() -> None:
+    cache = NegativeCache(ttl=300, maxsize=10)
+    generation = cache.generation()
+    cache.discard(2)
+    cache.add(1, since=generation)
+    assert 1 in cache
+
+def test_add_after_clear_is_skipped() -> None:
+    cache = NegativeCache(ttl=300, maxsize=10)
+    generation = cache.generation()
+    cache.clear()
+    cache.add(1, since=generation)
+    assert 1 not in cache
+
+def test_add_started_after_discard_is_kept() -> None:
+    cache = NegativeCache(ttl=300, maxsize=10)
+    cache.discard(1)
+    generation = cache.generation()
+    cache.add(1, since=generation)
+    assert 1 in cache
+
+def test_add_without_generation_ignores_invalidations() -> None:
+    cache = NegativeCache(ttl=300, maxsize=10)
+    cache.discard(1)
+    cache.add(1)
+    assert 1 in cache
+
+def test_evicted_invalidation_records_skip_older_adds() -> None:
+    cache = NegativeCache(ttl=300, maxsize=2)
+    generation = cache.generation()
+    cache.discard(1)
+    # Pushes the record for key 1 out of the bounded invalidation records
+    cache.discard(2)
+    cache.discard(3)
+    assert 1 not in cache.invalidations
+
+    # The add started before a record that has been dropped, so it cannot tell and is skipped
+    cache.add(1, since=generation)
+    cache.add(4, since=generation)
+    assert 1 not in cache
+    assert 4 not in cache
+
+    generation = cache.generation()
+    cache.add(4, since=generation)
+    assert 4 in cache
+
+def test_entries_are_bounded() -> None:
+    cache = NegativeCache(ttl=300, maxsize=2)
+    for key in range(3):
+        cache.add(key)
+    assert 0 not in cache
+    assert len(cache) == 2
+
+def test_entries_expire(monkeypatch) -> None:
+    now = 1000.0
+    monkeypatch.setattr('utils.cache.time.monotonic', lambda: now)
+    cache = NegativeCache(ttl=300, maxsize=10)
+    cache.add(1)
+    now += 301
+    assert 1 not in cache
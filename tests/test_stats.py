@@ -0,0 +1,83 @@
+from typing import Any
+
+import utils.incremental
+
+from utils.matchmaking import MatchmakingIndex
+from utils.stats import EventStats
+
+def team(team_id: int, name: str = 'team') -> dict[str, Any]:
+    return {'id': team_id, 'name': name}
+
+def user(discord_id: int, team_id: int | None = None) -> dict[str, Any]:
+    return {'discord_id': discord_id, 'school': 'Markville SS', 'grade': '11', 'shsm_sector': None, 'about': None, 'team_id': team_id}
+
+def test_replay_over_load_that_includes_the_events() -> None:
+    stats = EventStats()
+    # Dispatched while the bulk read was running, which already sees both members
+    stats.create_team(7, 1)
+    stats.join_team(7, 2)
+    stats.load([team(7)], [user(1, 7), user(2, 7)], [])  # type: ignore
+
+    assert {team_id: len(members) for team_id, members in stats.team_members.items()} == {7: 2}
+    assert +stats.team_fill == {2: 1}
+    assert stats.members_in_teams == 2
+    assert stats.teams == 1
+
+def test_replay_over_load_that_misses_the_events() -> None:
+    stats = EventStats()
+    stats.create_team(7, 1)
+    stats.join_team(7, 2)
+    stats.load([], [user(1), user(2)], [])  # type: ignore
+
+    assert +stats.team_fill == {2: 1}
+    assert stats.members_in_teams == 2
+
+def test_replayed_leave_is_idempotent() -> None:
+    stats = EventStats()
+    stats.leave_team(7, 2)
+    # The bulk read already saw the member leave
+    stats.load([team(7)], [user(1, 7), user(2)], [])  # type: ignore
+
+    assert +stats.team_fill == {1: 1}
+    assert stats.members_in_teams == 1
+
+    stats.leave_team(7, 2)
+    assert +stats.team_fill == {1: 1}
+
+def test_replayed_delete_after_create() -> None:
+    stats = EventStats()
+    stats.create_team(7, 1)
+    stats.delete_team(7)
+    stats.load([], [user(1)], [])  # type: ignore
+
+    assert stats.teams == 0
+    assert stats.members_in_teams == 0
+
+def test_replayed_registrant_is_counted_once() -> None:
+    stats = EventStats()
+    stats.add_registrant(1, {'discord_username': 'a', 'school': 'Markville SS', 'grade': '11', 'full_name': 'A', 'shsm_sector': 'None'})
+    stats.load([], [user(1)], [])  # type: ignore
+
+    assert stats.schools['Markville SS'] == 1
+
+def test_matchmaking_replayed_create_keeps_loaded_members() -> None:
+    index = MatchmakingIndex()
+    index.create_team(7, 'team', 1)
+    index.join_team(7, 2)
+    index.load([team(7)], [user(1, 7), user(2, 7)])  # type: ignore
+
+    assert index.teams[7].member_ids == {1, 2}
+
+def test_backlog_overflow_is_dropped_until_reset(monkeypatch) -> None:
+    monkeypatch.setattr(utils.incremental, 'MAX_BACKLOG', 3)
+    stats = EventStats()
+    for member_id in range(5):
+        stats.join_team(7, member_id)
+
+    assert stats.overflowed
+    assert stats.backlog == []
+
+    stats.reset_backlog()
+    stats.join_team(7, 1)
+    assert not stats.overflowed
+    assert len(stats.backlog) == 1
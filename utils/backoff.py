@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from typing import Awaitable, Callable, TypeVar
+
+logger = logging.getLogger()
+
+T = TypeVar('T')
+
+async def retry_with_backoff(attempt: Callable[[], Awaitable[T]], description: str, initial: float = 1.0, maximum: float = 60.0) -> T:
+    # Retries until the attempt succeeds, doubling the delay between attempts up to `maximum`
+    delay = initial
+    while True:
+        try:
+            return await attempt()
+        except Exception:
+            logger.exception(f"Failed to {description}, retrying in {delay:.0f}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, maximum)
@@ -8,18 +8,34 @@ import os
 import pathlib
 
 from discord.ext import commands
+from utils.backoff import retry_with_backoff
+from utils.cache import NegativeCache
 from utils.config import Config
 from utils.database import Database
+from utils.fast_path import FastPath
+from utils.invite_sweeper import InviteSweeper
+from utils.matchmaking import MatchmakingIndex
+from utils.member_edits import MemberEditScheduler
+from utils.replica import ReplicaSync
+from utils.snapshot import StateSnapshots
+from utils.stats import EventStats
+from utils.watchdog import LoopWatchdog
 
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
-    from utils.models import Registration
+    from utils.models import Registration, TeamInviteRecord, TeamRecordWithCounts, UserRecord
 
 logger = logging.getLogger()
 
 class Bot(commands.Bot):
-    def __init__(self, config: Config, database: Database) -> None:
+    def __init__(
+        self,
+        config: Config,
+        database: Database,
+        registrations_path: pathlib.Path | None = None,
+        snapshot_path: pathlib.Path | None = None,
+    ) -> None:
         intents = discord.Intents.default()
         intents.message_content = True
         intents.members = True
@@ -42,17 +58,72 @@ class Bot(commands.Bot):
         os.environ["JISHAKU_HIDE"] = "True"
         os.environ["JISHAKU_NO_UNDERSCORE"] = "True"
 
+        self.registrations_path = registrations_path or pathlib.Path(__file__).parent.parent / 'data/registrations.json'
+        # Registrations from the file, overlaid with the ones promoted from the database (manual verification)
         self.registrant_discord_mapping: dict[str, Registration] = {}
+        self.file_registrants: dict[str, Registration] = {}
+        # Username to Discord id of every registration promoted from the database
+        self.promoted_registrants: dict[str, int] = {}
+        # Discord ids of users that were recently looked up and are not registrants
+        self.non_registrants = NegativeCache(ttl=300, maxsize=10_000)
+        self.stats = EventStats()
         self.load_registrant_discord_mapping()
 
+        self.member_edits = MemberEditScheduler()
+        self.matchmaking = MatchmakingIndex()
+        self.invite_sweeper = InviteSweeper(self)
+        self.replica_sync = ReplicaSync(database)
+        self.fast_path = FastPath()
+        self.watchdog = LoopWatchdog()
+        self.snapshots = StateSnapshots(self, snapshot_path or pathlib.Path(__file__).parent.parent / 'data/state.snapshot')
+
     def load_registrant_discord_mapping(self) -> None:
-        with open(pathlib.Path(__file__).parent.parent / 'data/registrations.json', 'r') as file:
+        with open(self.registrations_path, 'r') as file:
             registrations: list[Registration] = json.load(file)
-            for registration in registrations:
-                if registration['discord_username']:
-                    self.registrant_discord_mapping[registration['discord_username'].lower().strip()] = registration
+            self.stats.registrations = len(registrations)
+            self.file_registrants = {
+                registration['discord_username'].lower().strip(): registration
+                for registration in registrations
+                if registration['discord_username']
+            }
+
+        # Rebuilt rather than merged, so registrations removed from the file are dropped on reload
+        mapping = dict(self.file_registrants)
+        for username in self.promoted_registrants:
+            if username in self.registrant_discord_mapping:
+                mapping[username] = self.registrant_discord_mapping[username]
+        self.registrant_discord_mapping = mapping
+        self.non_registrants.clear()
+
+    def promote_registrant(self, username: str, discord_id: int, registration: Registration) -> None:
+        self.registrant_discord_mapping[username] = registration
+        self.promoted_registrants[username] = discord_id
+
+    def drop_promoted_registrant(self, username: str) -> None:
+        # The users row is gone, so only the registrations file can still vouch for this username
+        self.promoted_registrants.pop(username, None)
+        if username in self.file_registrants:
+            self.registrant_discord_mapping[username] = self.file_registrants[username]
+        else:
+            self.registrant_discord_mapping.pop(username, None)
+
+    async def add_registrant(self, registration: Registration, member: discord.Member | discord.User) -> None:
+        await self.database.create_user_if_not_exists(registration, member)
+        self.promote_registrant(str(member).lower(), member.id, registration)
+        self.non_registrants.discard(member.id)
+        self.dispatch('registrant_add', member.id, registration)
 
     async def setup_hook(self) -> None:
+        self.watchdog.start()
+        self.member_edits.start()
+        self.invite_sweeper.sweep_loop.start()
+        self.replica_sync.sync_loop.start()
+        if self.snapshots.restore():
+            self.event_state_task = asyncio.create_task(self.snapshots.reconcile(), name='event-state-reconcile')
+        else:
+            self.event_state_task = asyncio.create_task(self.load_event_state(), name='event-state-load')
+        self.snapshots.save_loop.start()
+
         for extension in self.INITIAL_EXTENSIONS:
             await self.load_extension(extension)
 
@@ -63,9 +134,61 @@ class Bot(commands.Bot):
         else:
             logging.warning("No guild id found in config.toml. Commands not synced.")
 
+    async def load_event_state(self) -> None:
+        # Until this succeeds the replica, matchmaking and statistics are not ready, so keep retrying
+        states = (self.database.replica, self.matchmaking, self.stats)
+
+        async def fetch() -> tuple[list[TeamRecordWithCounts], list[UserRecord], list[TeamInviteRecord]]:
+            for state in states:
+                state.reset_backlog()
+            teams = await self.database.fetch_all_teams()
+            users = await self.database.fetch_all_users()
+            invites = await self.database.fetch_all_team_invites()
+            return teams, users, invites
+
+        while True:
+            teams, users, invites = await retry_with_backoff(fetch, "load users and teams for the replica, matchmaking and statistics")
+            if not any(state.overflowed for state in states):
+                break
+            logger.warning("Too many events arrived while loading users and teams, loading them again")
+
+        self.database.replica.load(teams, users)
+        self.matchmaking.load(teams, users)
+        self.stats.load(teams, users, invites)
+
+    def rebuild_event_state(self, invites: list[TeamInviteRecord]) -> None:
+        # Rebuilds matchmaking and statistics from the replica in one step, so no event can fall between the two
+        replica = self.database.replica
+        teams, users = replica.teams_with_counts(), list(replica.users.values())
+
+        matchmaking = MatchmakingIndex()
+        matchmaking.load(teams, users)
+        stats = EventStats()
+        stats.registrations = self.stats.registrations
+        stats.load(teams, users, invites)
+        stats.load_unverified(self.stats.unverified)
+        self.matchmaking, self.stats = matchmaking, stats
+
+    async def close(self) -> None:
+        await self.member_edits.stop()
+        self.invite_sweeper.sweep_loop.cancel()
+        self.replica_sync.sync_loop.cancel()
+        self.snapshots.save_loop.cancel()
+        try:
+            await self.snapshots.save()
+        except Exception:
+            logger.exception("Failed to save state snapshot on shutdown")
+        await self.watchdog.stop()
+        await super().close()
+
     async def on_ready(self) -> None:
         logger.info(f"Logged in as {self.user} (ID: {self.user and self.user.id})")
 
+        guild = self.get_guild(self.config.bot.guild_id)
+        unverified_role = guild and guild.get_role(self.config.bot.unverified_role_id)
+        if unverified_role is not None:
+            self.stats.load_unverified(member.id for member in unverified_role.members)
+
     def error_embed(self, title: str, description: str = '') -> discord.Embed:
         return discord.Embed(title=title, color=self.config.embeds.error_color, description=description)
 
@@ -90,20 +213,34 @@ class Bot(commands.Bot):
         await channel.send(embed=embed)
 
     async def get_or_fetch_user_registration(self, member: discord.Member | discord.User) -> Registration | None:
-        registration = self.registrant_discord_mapping.get(str(member).lower())
+        username = str(member).lower()
+        replica = self.database.replica
+        if username in self.promoted_registrants and replica.ready and replica.user(member.id) is None:
+            self.drop_promoted_registrant(username)
+
+        registration = self.registrant_discord_mapping.get(username)
         if registration:
             return registration
 
+        if member.id in self.non_registrants:
+            return None
+
         # if the user was verified manually
+        generation = self.non_registrants.generation()
         user = await self.database.fetch_user(member)
         if user:
-            return {
+            registration = {
                 'discord_username': str(member),
                 'school': user['school'],
                 'grade': user['grade'],
                 'full_name': user['full_name'],
                 'shsm_sector': user['shsm_sector'],
             }
+            self.promote_registrant(username, member.id, registration)
+            return registration
+
+        # Skipped if the member was verified while the lookup was in flight
+        self.non_registrants.add(member.id, since=generation)
         return None
 
     async def on_member_join(self, member: discord.Member) -> None:
@@ -118,18 +255,21 @@ class Bot(commands.Bot):
                 logger.warning(f"Hacker role not found.")
                 return
 
-            await member.add_roles(role)
-
-            await member.edit(nick=registration['full_name'])
-            await self.database.create_user_if_not_exists(registration, member)
+            # The edit waits its turn in the queue while the user row is inserted
+            edit = self.member_edits.edit(member, add_roles=[role], nick=registration['full_name'])
+            await self.add_registrant(registration, member)
+            nick_error = await edit
+            if nick_error is not None:
+                asyncio.create_task(self.log_message(f"User {member.mention} was verified but their nickname could not be set to their full name."))
         else:
+            self.stats.add_unverified(member.id)
             asyncio.create_task(self.log_message(f"User {member.mention} joined the server but is not a registrant."))
 
             role = member.guild.get_role(self.config.bot.unverified_role_id)
             if role is None:
                 logger.warning(f"Unverified role not found.")
                 return
-            await member.add_roles(role)
+            await self.member_edits.edit(member, add_roles=[role])
 
             try:
                 await member.send(embed=self.info_embed(
@@ -138,3 +278,38 @@ class Bot(commands.Bot):
                 ))
             except discord.Forbidden:
                 asyncio.create_task(self.log_message(f"User {member.mention} has DMs disabled. Unable to send welcome/unverified message."))
+
+    async def on_member_remove(self, member: discord.Member) -> None:
+        self.stats.remove_member(member.id)
+
+    async def on_registrant_add(self, member_id: int, registration: Registration) -> None:
+        self.matchmaking.add_user(member_id, registration['school'], str(registration['grade']), registration['shsm_sector'])
+        self.stats.add_registrant(member_id, registration)
+
+    async def on_profile_update(self, member_id: int, about: str) -> None:
+        self.matchmaking.update_about(member_id, about)
+
+    async def on_team_create(self, team_id: int, name: str, owner_id: int) -> None:
+        self.matchmaking.create_team(team_id, name, owner_id)
+        self.stats.create_team(team_id, owner_id)
+
+    async def on_team_rename(self, team_id: int, name: str) -> None:
+        self.matchmaking.rename_team(team_id, name)
+
+    async def on_team_delete(self, team_id: int) -> None:
+        self.matchmaking.delete_team(team_id)
+        self.stats.delete_team(team_id)
+
+    async def on_team_join(self, team_id: int, member_id: int) -> None:
+        self.matchmaking.join_team(team_id, member_id)
+        self.stats.join_team(team_id, member_id)
+
+    async def on_team_leave(self, team_id: int, member_id: int) -> None:
+        self.matchmaking.leave_team(team_id, member_id)
+        self.stats.leave_team(team_id, member_id)
+
+    async def on_team_invite(self, team_id: int, member_id: int) -> None:
+        self.stats.add_invite(team_id, member_id)
+
+    async def on_team_invite_resolve(self, team_id: int, member_id: int) -> None:
+        self.stats.resolve_invite(team_id, member_id)
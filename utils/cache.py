@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import collections
+import time
+
+from typing import Hashable, Iterator
+
+# Remembers keys that recently had no result (e.g. users that are not registered) so repeated lookups can skip
+# the database. Entries expire after `ttl` seconds and the oldest entries are evicted past `maxsize`.
+#
+# A lookup that misses can race with the write that makes the key exist. Callers take a `generation()` before the
+# lookup and pass it to `add`, which skips keys that were discarded (or the whole cache cleared) since then.
+class NegativeCache:
+    def __init__(self, ttl: float, maxsize: int) -> None:
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.entries: collections.OrderedDict[Hashable, float] = collections.OrderedDict()
+        self.current_generation = 0
+        # Generation each key was last discarded at, bounded like the entries. Anything older than `forgotten` has
+        # been dropped, so adds started before it are skipped rather than risk caching a stale miss.
+        self.invalidations: collections.OrderedDict[Hashable, int] = collections.OrderedDict()
+        self.forgotten = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        expires_at = self.entries.get(key)
+        if expires_at is None:
+            return False
+        if expires_at < time.monotonic():
+            del self.entries[key]
+            return False
+        return True
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __iter__(self) -> Iterator[Hashable]:
+        now = time.monotonic()
+        return iter([key for key, expires_at in self.entries.items() if expires_at >= now])
+
+    def generation(self) -> int:
+        return self.current_generation
+
+    def add(self, key: Hashable, since: int | None = None) -> None:
+        if since is not None and (since < self.forgotten or self.invalidations.get(key, -1) >= since):
+            return
+        self.entries[key] = time.monotonic() + self.ttl
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def discard(self, key: Hashable) -> None:
+        self.entries.pop(key, None)
+        self.invalidations[key] = self.current_generation
+        self.invalidations.move_to_end(key)
+        self.current_generation += 1
+        while len(self.invalidations) > self.maxsize:
+            _, generation = self.invalidations.popitem(last=False)
+            self.forgotten = generation + 1
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.invalidations.clear()
+        self.current_generation += 1
+        self.forgotten = self.current_generation
+
+    def export(self) -> list[tuple[Hashable, float]]:
+        # Remaining lifetimes rather than monotonic deadlines, which mean nothing to another process
+        now = time.monotonic()
+        return [(key, expires_at - now) for key, expires_at in self.entries.items() if expires_at >= now]
+
+    def restore(self, entries: list[tuple[Hashable, float]], elapsed: float = 0.0) -> None:
+        now = time.monotonic()
+        for key, remaining in entries:
+            if remaining > elapsed:
+                self.entries[key] = now + remaining - elapsed
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
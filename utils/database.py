@@ -2,24 +2,33 @@ from __future__ import annotations
 
 from supabase._async.client import AsyncClient as Client
 from supabase import PostgrestAPIError
+import datetime
 import discord
 
+from utils.replica import Replica
+
 # from async_lru import alru_cache
 
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
-    from utils.models import Registration, TeamRecord, TeamRecordWithCounts, UserRecord
+    from utils.models import DeletedRowRecord, Registration, TeamInviteRecord, TeamRecord, TeamRecordWithCounts, UserRecord
 
     UserType = discord.Member | discord.User
 
 class Database:
     def __init__(self, supabase: Client) -> None:
         self.supabase = supabase
+        # Reads of users and teams are served from the replica once it is loaded
+        self.replica = Replica()
+
+    def write_users(self, users: list[UserRecord] | None) -> None:
+        for user in users or []:
+            self.replica.write_user(user)
 
     async def create_user_if_not_exists(self, registration: Registration, member: UserType) -> None:
         try:
-            await self.supabase.table('users').insert({
+            response = await self.supabase.table('users').insert({
                 'discord_id': member.id,
                 'school': registration['school'],
                 'grade': registration['grade'],
@@ -32,21 +41,30 @@ class Database:
                 pass
             else:
                 raise
+        else:
+            self.write_users(response.data)
 
     async def fetch_user(self, member: UserType) -> UserRecord | None:
+        if self.replica.ready:
+            return self.replica.user(member.id)
+
         response = await self.supabase.table('users').select('*').eq('discord_id', member.id).execute()
         if not response.data:
             return None
         return response.data[0]
 
     async def update_user_about(self, member: UserType, about: str) -> None:
-        await self.supabase.table('users').update({'about': about}).eq('discord_id', member.id).execute()
+        response = await self.supabase.table('users').update({'about': about}).eq('discord_id', member.id).execute()
+        self.write_users(response.data)
 
     async def fetch_team_members(self, team_id: int) -> list[discord.Object]:
+        if self.replica.ready:
+            return [discord.Object(id=discord_id) for discord_id in self.replica.members(team_id)]
+
         response = await self.supabase.table('users').select('discord_id').eq('team_id', team_id).execute()
         return [discord.Object(id=member['discord_id']) for member in response.data]
 
-    async def create_team(self, name: str, member: UserType) -> bool:
+    async def create_team(self, name: str, member: UserType) -> TeamRecord | None:
         try:
             response = await self.supabase.table('teams').insert({
                 'name': name,
@@ -54,19 +72,92 @@ class Database:
             }).execute()
         except PostgrestAPIError as e:
             # Likely, there is already a team with that name
-            return False
+            return None
 
-        team_id = response.data[0]['id']
-        await self.supabase.table('users').update({'team_id': team_id}).eq('discord_id', member.id).execute()
-        return True
+        team = response.data[0]
+        self.replica.write_team(team)
+        response = await self.supabase.table('users').update({'team_id': team['id']}).eq('discord_id', member.id).execute()
+        self.write_users(response.data)
+        return team
 
     # # TODO: Experiment with the ttl. The goal is so that the teams aren't repeatedly fetched while one user is *using the same slash command*.
     # @alru_cache(maxsize=32, ttl=7)
     async def fetch_teams(self, user: UserType) -> list[TeamRecordWithCounts]:
+        if self.replica.ready:
+            return self.replica.teams_with_counts()
+
         response = await self.supabase.rpc('fetch_teams_with_counts').execute()
         return response.data if response.data else []
 
+    async def fetch_users_page(self, after_id: int, limit: int) -> list[UserRecord]:
+        response = await self.supabase.table('users').select('*').gt('id', after_id).order('id').limit(limit).execute()
+        return response.data if response.data else []
+
+    async def fetch_teams_page(self, after_id: int, limit: int) -> list[TeamRecordWithCounts]:
+        response = await self.supabase.rpc('fetch_teams_with_counts', {}).gt('id', after_id).order('id').limit(limit).execute()
+        return response.data if response.data else []
+
+    async def fetch_team_invites_page(self, after_id: int, limit: int, archived: bool = False) -> list[TeamInviteRecord]:
+        # Resolved invites are moved to team_invites_archive a day after they are resolved
+        table = 'team_invites_archive' if archived else 'team_invites'
+        response = await self.supabase.table(table).select('*').gt('id', after_id).order('id').limit(limit).execute()
+        return response.data if response.data else []
+
+    async def fetch_all_users(self, page_size: int = 1000) -> list[UserRecord]:
+        users: list[UserRecord] = []
+        while page := await self.fetch_users_page(users[-1]['id'] if users else 0, page_size):
+            users.extend(page)
+        return users
+
+    async def fetch_all_teams(self, page_size: int = 1000) -> list[TeamRecordWithCounts]:
+        teams: list[TeamRecordWithCounts] = []
+        while page := await self.fetch_teams_page(teams[-1]['id'] if teams else 0, page_size):
+            teams.extend(page)
+        return teams
+
+    async def fetch_users_updated_since(self, since: str | None, page_size: int = 1000) -> list[UserRecord]:
+        users: list[UserRecord] = []
+        while True:
+            query = self.supabase.table('users').select('*')
+            if since is not None:
+                query = query.gte('updated_at', since)
+            response = await query.gt('id', users[-1]['id'] if users else 0).order('id').limit(page_size).execute()
+            users.extend(response.data or [])
+            if len(response.data or []) < page_size:
+                return users
+
+    async def fetch_teams_updated_since(self, since: str | None, page_size: int = 1000) -> list[TeamRecord]:
+        teams: list[TeamRecord] = []
+        while True:
+            query = self.supabase.table('teams').select('*')
+            if since is not None:
+                query = query.gte('updated_at', since)
+            response = await query.gt('id', teams[-1]['id'] if teams else 0).order('id').limit(page_size).execute()
+            teams.extend(response.data or [])
+            if len(response.data or []) < page_size:
+                return teams
+
+    async def fetch_deleted_rows_since(self, since: str | None, page_size: int = 1000) -> list[DeletedRowRecord]:
+        deleted: list[DeletedRowRecord] = []
+        while True:
+            query = self.supabase.table('deleted_rows').select('*')
+            if since is not None:
+                query = query.gte('deleted_at', since)
+            response = await query.gt('id', deleted[-1]['id'] if deleted else 0).order('id').limit(page_size).execute()
+            deleted.extend(response.data or [])
+            if len(response.data or []) < page_size:
+                return deleted
+
+    async def fetch_all_team_invites(self, page_size: int = 1000) -> list[TeamInviteRecord]:
+        invites: list[TeamInviteRecord] = []
+        while page := await self.fetch_team_invites_page(invites[-1]['id'] if invites else 0, page_size):
+            invites.extend(page)
+        return invites
+
     async def fetch_team_by_member_id(self, team_member_id: int) -> TeamRecord | None:
+        if self.replica.ready:
+            return self.replica.team_by_member_id(team_member_id)
+
         response = await self.supabase.table('users').select('team_id').eq('discord_id', team_member_id).execute()
         if not response.data:
             return None
@@ -78,6 +169,10 @@ class Database:
         return team_response.data[0] if team_response.data else None
 
     async def fetch_team_by_id(self, team_id: int) -> TeamRecordWithCounts | None:
+        if self.replica.ready:
+            team = self.replica.team(team_id)
+            return self.replica.team_with_count(team) if team else None
+
         response = await self.supabase.rpc('fetch_team_with_count', {'p_team_id': team_id}).execute()
         return response.data[0] if response.data else None
 
@@ -87,30 +182,63 @@ class Database:
 
     async def rename_team(self, owner_id, new_name: str) -> list[TeamRecord]:
         response = await self.supabase.table('teams').update({'name': new_name}).eq('owner_id', owner_id).execute()
+        for team in response.data or []:
+            self.replica.write_team(team)
         return response.data
 
-    async def invite_to_team(self, inviter: UserType, member: UserType) -> bool:
-        await self.supabase.rpc('invite_user_to_team', {
+    async def invite_to_team(self, inviter: UserType, member: UserType, ttl: datetime.timedelta) -> TeamInviteRecord | None:
+        response = await self.supabase.rpc('invite_user_to_team', {
             'inviter_id': inviter.id,
-            'invitee_id': member.id
+            'invitee_id': member.id,
+            'invite_ttl_seconds': int(ttl.total_seconds()),
         }).execute()
-        return True
+        return response.data[0] if response.data else None
+
+    async def set_team_invite_message(self, invite_id: int, channel_id: int, message_id: int) -> None:
+        await self.supabase.table('team_invites').update({'channel_id': channel_id, 'message_id': message_id}).eq('id', invite_id).execute()
 
     async def kick_from_team(self, user: UserType) -> None:
-        await self.supabase.table('users').update({'team_id': None}).eq('discord_id', user.id).execute()
+        response = await self.supabase.table('users').update({'team_id': None}).eq('discord_id', user.id).execute()
+        self.write_users(response.data)
 
     async def leave_team(self, user: UserType) -> list[TeamRecord]:
         response = await self.supabase.table('users').update({'team_id': None}).eq('discord_id', user.id).execute()
+        self.write_users(response.data)
         return response.data
     
     async def delete_team(self, owner: UserType) -> list[TeamRecord]:
         response = await self.supabase.table('teams').delete().eq('owner_id', owner.id).execute()
+        for team in response.data or []:
+            self.replica.write_team_delete(team['id'])
         return response.data
 
-    async def accept_team_invite(self, user: UserType, team_id: int) -> None:
-        await self.supabase.table('users').update({'team_id': team_id}).eq('discord_id', user.id).execute()
-        await self.supabase.table('team_invites').update({'status': 'accepted'}).eq('team_id', team_id).eq('user_id', user.id).execute()
-        # await self.supabase.table('team_invites').delete().eq('team_id', team_id).eq('user_id', member.id).execute()
+    async def resolve_team_invite(self, user: UserType, team_id: int, status: str) -> TeamInviteRecord | None:
+        # Only pending invites that have not expired can be resolved
+        response = await self.supabase.rpc('resolve_team_invite', {
+            'p_team_id': team_id,
+            'p_user_id': user.id,
+            'p_status': status,
+        }).execute()
+        return response.data[0] if response.data else None
 
-    async def decline_team_invite(self, user: UserType, team_id: int) -> None:
-        await self.supabase.table('team_invites').update({'status': 'declined'}).eq('team_id', team_id).eq('user_id', user.id).execute()
+    async def accept_team_invite(self, user: UserType, team_id: int) -> TeamInviteRecord | None:
+        invite = await self.resolve_team_invite(user, team_id, 'accepted')
+        if invite is None:
+            return None
+        response = await self.supabase.table('users').update({'team_id': team_id}).eq('discord_id', user.id).execute()
+        self.write_users(response.data)
+        return invite
+
+    async def decline_team_invite(self, user: UserType, team_id: int) -> TeamInviteRecord | None:
+        return await self.resolve_team_invite(user, team_id, 'declined')
+
+    async def expire_team_invites(self, batch_size: int) -> list[TeamInviteRecord]:
+        response = await self.supabase.rpc('expire_team_invites', {'batch_size': batch_size}).execute()
+        return response.data if response.data else []
+
+    async def archive_team_invites(self, retention: datetime.timedelta, batch_size: int) -> int:
+        response = await self.supabase.rpc('archive_team_invites', {
+            'retention_seconds': int(retention.total_seconds()),
+            'batch_size': batch_size,
+        }).execute()
+        return response.data or 0
@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import abc
+import asyncio
+import csv
+import pathlib
+
+import discord
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+from typing import TYPE_CHECKING, Any, Literal
+
+from utils.models import MAX_TEAM_SIZE
+
+if TYPE_CHECKING:
+    from utils.bot import Bot
+    from utils.models import TeamRecordWithCounts
+
+    ExportFormat = Literal['csv', 'parquet']
+    TeamFilter = Literal['all', 'full', 'open']
+
+EXPORT_PAGE_SIZE = 500
+
+# (column name, parquet type); the parquet types are only resolved when pyarrow is installed.
+# Registrations are matched by Discord username, which is only known for members still in the guild. For members who
+# have left, discord_username is empty, registered is null (unknown rather than False), and full_name, school, grade and
+# shsm_sector come from their users row.
+MEMBER_COLUMNS = [
+    ('discord_id', 'int64'),
+    ('discord_username', 'string'),
+    ('registered', 'bool_'),
+    ('full_name', 'string'),
+    ('school', 'string'),
+    ('grade', 'string'),
+    ('shsm_sector', 'string'),
+    ('about', 'string'),
+    ('team_id', 'int64'),
+    ('team_name', 'string'),
+    ('team_role', 'string'),
+    ('team_member_count', 'int64'),
+]
+
+TEAM_COLUMNS = [
+    ('id', 'int64'),
+    ('name', 'string'),
+    ('owner_id', 'int64'),
+    ('member_count', 'int64'),
+    ('created_at', 'string'),
+]
+
+# Both live and archived invites are exported; `archived` tells them apart
+INVITE_COLUMNS = [
+    ('id', 'int64'),
+    ('team_id', 'int64'),
+    ('team_name', 'string'),
+    ('user_id', 'int64'),
+    ('discord_username', 'string'),
+    ('invited_by', 'int64'),
+    ('status', 'string'),
+    ('created_at', 'string'),
+    ('archived', 'bool_'),
+]
+
+class ExportWriter(abc.ABC):
+    def __init__(self, path: pathlib.Path, columns: list[tuple[str, str]]) -> None:
+        self.path = path
+        self.columns = columns
+
+    @abc.abstractmethod
+    def write_rows(self, rows: list[dict[str, Any]]) -> None:
+        ...
+
+    @abc.abstractmethod
+    def close(self) -> None:
+        ...
+
+class CSVExportWriter(ExportWriter):
+    def __init__(self, path: pathlib.Path, columns: list[tuple[str, str]]) -> None:
+        super().__init__(path, columns)
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.DictWriter(self.file, fieldnames=[name for name, _ in columns])
+        self.writer.writeheader()
+
+    def write_rows(self, rows: list[dict[str, Any]]) -> None:
+        self.writer.writerows(rows)
+
+    def close(self) -> None:
+        self.file.close()
+
+class ParquetExportWriter(ExportWriter):
+    def __init__(self, path: pathlib.Path, columns: list[tuple[str, str]]) -> None:
+        if pyarrow is None:
+            raise RuntimeError("pyarrow is required for parquet exports")
+
+        super().__init__(path, columns)
+        self.schema = pyarrow.schema([(name, getattr(pyarrow, type_name)()) for name, type_name in columns])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+
+    def write_rows(self, rows: list[dict[str, Any]]) -> None:
+        # Each page becomes its own row group, so only one page is held in memory at a time
+        if rows:
+            self.writer.write_table(pyarrow.Table.from_pylist(rows, schema=self.schema))
+
+    def close(self) -> None:
+        self.writer.close()
+
+def parquet_available() -> bool:
+    return pyarrow is not None
+
+def open_writer(directory: pathlib.Path, name: str, file_format: ExportFormat, columns: list[tuple[str, str]]) -> ExportWriter:
+    if file_format == 'parquet':
+        return ParquetExportWriter(directory / f'{name}.parquet', columns)
+    return CSVExportWriter(directory / f'{name}.csv', columns)
+
+def team_matches_filter(team: TeamRecordWithCounts, team_filter: TeamFilter) -> bool:
+    if team_filter == 'full':
+        return team['member_count'] >= MAX_TEAM_SIZE
+    if team_filter == 'open':
+        return team['member_count'] < MAX_TEAM_SIZE
+    return True
+
+class TeamExporter:
+    def __init__(self, bot: Bot, guild: discord.Guild, directory: pathlib.Path, file_format: ExportFormat, team_filter: TeamFilter) -> None:
+        self.bot = bot
+        self.guild = guild
+        self.directory = directory
+        self.file_format: ExportFormat = file_format
+        self.team_filter: TeamFilter = team_filter
+        self.teams: dict[int, TeamRecordWithCounts] = {}
+
+    def discord_username(self, discord_id: int) -> str:
+        member = self.guild.get_member(discord_id)
+        return str(member) if member else ''
+
+    async def export_teams(self) -> pathlib.Path:
+        # The matching teams are also kept in memory, to fill in the team columns of the other files
+        writer = open_writer(self.directory, 'teams', self.file_format, TEAM_COLUMNS)
+        try:
+            after_id = 0
+            while page := await self.bot.database.fetch_teams_page(after_id, EXPORT_PAGE_SIZE):
+                after_id = page[-1]['id']
+                rows = []
+                for team in page:
+                    if not team_matches_filter(team, self.team_filter):
+                        continue
+                    self.teams[team['id']] = team
+                    rows.append({name: team[name] for name, _ in TEAM_COLUMNS})  # type: ignore
+                await asyncio.to_thread(writer.write_rows, rows)
+        finally:
+            await asyncio.to_thread(writer.close)
+        return writer.path
+
+    async def export_members(self) -> pathlib.Path:
+        writer = open_writer(self.directory, 'members', self.file_format, MEMBER_COLUMNS)
+        try:
+            after_id = 0
+            while page := await self.bot.database.fetch_users_page(after_id, EXPORT_PAGE_SIZE):
+                after_id = page[-1]['id']
+                rows = []
+                for user in page:
+                    team = self.teams.get(user['team_id']) if user['team_id'] is not None else None
+                    if team is None and self.team_filter != 'all':
+                        continue
+
+                    username = self.discord_username(user['discord_id'])
+                    registration = self.bot.registrant_discord_mapping.get(username.lower()) if username else None
+                    source = registration or user
+                    rows.append({
+                        'discord_id': user['discord_id'],
+                        'discord_username': username,
+                        'registered': registration is not None if username else None,
+                        'full_name': source['full_name'],
+                        'school': source['school'],
+                        'grade': str(source['grade']),
+                        'shsm_sector': source['shsm_sector'],
+                        'about': user['about'],
+                        'team_id': team and team['id'],
+                        'team_name': team and team['name'],
+                        'team_role': team and ('owner' if team['owner_id'] == user['discord_id'] else 'member'),
+                        'team_member_count': team and team['member_count'],
+                    })
+                await asyncio.to_thread(writer.write_rows, rows)
+        finally:
+            await asyncio.to_thread(writer.close)
+        return writer.path
+
+    async def export_invites(self) -> pathlib.Path:
+        writer = open_writer(self.directory, 'invites', self.file_format, INVITE_COLUMNS)
+        try:
+            for archived in (False, True):
+                after_id = 0
+                while page := await self.bot.database.fetch_team_invites_page(after_id, EXPORT_PAGE_SIZE, archived=archived):
+                    after_id = page[-1]['id']
+                    rows = []
+                    for invite in page:
+                        team = self.teams.get(invite['team_id'])
+                        if team is None and self.team_filter != 'all':
+                            continue
+
+                        rows.append({
+                            'id': invite['id'],
+                            'team_id': invite['team_id'],
+                            'team_name': team and team['name'],
+                            'user_id': invite['user_id'],
+                            'discord_username': self.discord_username(invite['user_id']),
+                            'invited_by': invite['invited_by'],
+                            'status': invite['status'],
+                            'created_at': invite['created_at'],
+                            'archived': archived,
+                        })
+                    await asyncio.to_thread(writer.write_rows, rows)
+        finally:
+            await asyncio.to_thread(writer.close)
+        return writer.path
+
+    async def export(self) -> list[discord.File]:
+        paths = [await self.export_teams(), await self.export_members(), await self.export_invites()]
+        return [discord.File(path, filename=path.name) for path in paths]
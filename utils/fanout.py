@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+
+import discord
+
+from typing import Any, Awaitable
+
+logger = logging.getLogger()
+
+async def supervise(side_effect: Awaitable[Any], description: str) -> None:
+    try:
+        await side_effect
+    except discord.Forbidden:
+        logger.info(f"Side effect not permitted: {description}")
+    except Exception:
+        logger.exception(f"Side effect failed: {description}")
+
+async def run_side_effects(*side_effects: Awaitable[Any], description: str) -> None:
+    # Side effects such as DMs and log messages run after the user already has a reply. They run concurrently and
+    # a failing side effect is logged without cancelling the others.
+    async with asyncio.TaskGroup() as group:
+        for side_effect in side_effects:
+            group.create_task(supervise(side_effect, description))
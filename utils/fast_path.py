@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import discord
+import logging
+
+from typing import Any
+
+logger = logging.getLogger()
+
+# Replies to an interaction directly with response.send_message when the handler reaches its first reply within the
+# budget, which it does whenever its reads are served from the replica or another local index. Only once the budget
+# runs out is the interaction deferred, and the reply then goes out as a followup. This saves the defer round trip
+# and the "thinking" state on every command that does not have to wait on Supabase.
+class FastReply:
+    def __init__(self, interaction: discord.Interaction, fast_path: FastPath, ephemeral: bool = False) -> None:
+        self.interaction = interaction
+        self.fast_path = fast_path
+        self.ephemeral = ephemeral
+        self.command = interaction.command.qualified_name if interaction.command else 'unknown'
+        self.lock = asyncio.Lock()
+        self.timer = asyncio.create_task(self.defer_after_budget(), name=f'fast-reply-{interaction.id}')
+
+    async def defer_after_budget(self) -> None:
+        await asyncio.sleep(self.fast_path.budget)
+        async with self.lock:
+            if not self.interaction.response.is_done():
+                self.fast_path.deferred[self.command] += 1
+                try:
+                    await self.interaction.response.defer(thinking=True, ephemeral=self.ephemeral)
+                except discord.HTTPException:
+                    logger.warning(f"Failed to defer /{self.command} after the fast path budget ran out")
+
+    async def send(self, *args: Any, **kwargs: Any) -> discord.Message:
+        async with self.lock:
+            if not self.interaction.response.is_done():
+                self.timer.cancel()
+                self.fast_path.fast[self.command] += 1
+                response = await self.interaction.response.send_message(*args, ephemeral=self.ephemeral, **kwargs)
+                if isinstance(response.resource, discord.InteractionMessage):
+                    return response.resource
+                return await self.interaction.original_response()
+        return await self.interaction.followup.send(*args, ephemeral=self.ephemeral, wait=True, **kwargs)
+
+# Counts how often each command was answered directly versus deferred
+class FastPath:
+    def __init__(self, budget: float = 0.5) -> None:
+        self.budget = budget
+        self.fast: collections.Counter[str] = collections.Counter()
+        self.deferred: collections.Counter[str] = collections.Counter()
+
+    def reply(self, interaction: discord.Interaction, *, ephemeral: bool = False) -> FastReply:
+        return FastReply(interaction, self, ephemeral)
+
+    def hit_rate(self, command: str | None = None) -> float | None:
+        if command is None:
+            fast, deferred = sum(self.fast.values()), sum(self.deferred.values())
+        else:
+            fast, deferred = self.fast[command], self.deferred[command]
+        return fast / (fast + deferred) if fast + deferred else None
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+from typing import Any, Callable
+
+# Events queued while loading past this many are dropped, and the loader reads everything again instead
+MAX_BACKLOG = 10_000
+
+# Base for in-memory state that is loaded once in the background and then kept current by bot events. Events that
+# arrive while the state is still loading are queued and replayed in order once it is ready. The bulk read may already
+# include a queued event, so every event handler must be idempotent (set memberships, not apply deltas).
+#
+# Events are dispatched after their write commits, so a bulk read started after an event includes it. That lets the
+# loader clear the backlog before each read attempt, and start over once the backlog has overflowed.
+class IncrementalState:
+    def __init__(self) -> None:
+        self.ready = False
+        self.backlog: list[tuple[Callable[..., None], tuple[Any, ...]]] = []
+        self.overflowed = False
+
+    def defer(self, method: Callable[..., None], *args: Any) -> bool:
+        if self.ready:
+            return False
+        if len(self.backlog) >= MAX_BACKLOG:
+            self.backlog.clear()
+            self.overflowed = True
+        if not self.overflowed:
+            self.backlog.append((method, args))
+        return True
+
+    def reset_backlog(self) -> None:
+        self.backlog.clear()
+        self.overflowed = False
+
+    def mark_ready(self) -> None:
+        self.ready = True
+        for method, args in self.backlog:
+            method(*args)
+        self.backlog.clear()
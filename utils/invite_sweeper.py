@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import datetime
+import discord
+import logging
+
+from discord.ext import tasks
+
+from utils.fanout import run_side_effects
+from views.team_invite import TeamInviteView
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from main import Bot
+    from utils.models import TeamInviteRecord
+
+logger = logging.getLogger()
+
+# Background task that expires pending team invites once their TTL has passed and moves resolved invites into the
+# archive table after a retention period. Both run in small batches so a backlog never holds locks on team_invites for
+# long. Expired invites get their buttons disabled, whether or not their view is still live in this process, and so do
+# invites resolved by /team accept and /team decline (see `close`).
+class InviteSweeper:
+    def __init__(
+        self,
+        bot: Bot,
+        ttl: datetime.timedelta = datetime.timedelta(hours=48),
+        retention: datetime.timedelta = datetime.timedelta(days=1),
+        interval: float = 60.0,
+        batch_size: int = 100,
+    ) -> None:
+        self.bot = bot
+        self.ttl = ttl
+        self.retention = retention
+        self.batch_size = batch_size
+        self.views: dict[tuple[int, int], TeamInviteView] = {}
+        self.expired = 0
+        self.archived = 0
+        self.sweep_loop.change_interval(seconds=interval)
+
+    def track(self, team_id: int, user_id: int, view: TeamInviteView) -> None:
+        previous = self.views.pop((team_id, user_id), None)
+        if previous is not None:
+            previous.disable()
+        self.views[team_id, user_id] = view
+
+    def untrack(self, team_id: int, user_id: int) -> None:
+        self.views.pop((team_id, user_id), None)
+
+    @tasks.loop(seconds=60.0)
+    async def sweep_loop(self) -> None:
+        try:
+            await self.sweep()
+        except Exception:
+            logger.exception("Failed to sweep team invites")
+
+    async def sweep(self) -> None:
+        while expired := await self.bot.database.expire_team_invites(self.batch_size):
+            self.expired += len(expired)
+            await run_side_effects(*(self.expire(invite) for invite in expired), description="expired team invite cleanup")
+            if len(expired) < self.batch_size:
+                break
+
+        while archived := await self.bot.database.archive_team_invites(self.retention, self.batch_size):
+            self.archived += archived
+            if archived < self.batch_size:
+                break
+
+    async def expire(self, invite: TeamInviteRecord) -> None:
+        self.bot.dispatch('team_invite_resolve', invite['team_id'], invite['user_id'])
+        await self.close(invite)
+
+    async def close(self, invite: TeamInviteRecord) -> None:
+        # Stops tracking a resolved invite and disables the buttons on its message
+        view = self.views.pop((invite['team_id'], invite['user_id']), None)
+        if view is None:
+            # The view did not survive a restart, so disable a stand-in with the same buttons
+            view = TeamInviteView(self.bot, '', discord.Object(invite['invited_by']), discord.Object(invite['user_id']), invite['team_id'])  # type: ignore
+        view.disable()
+
+        if invite['channel_id'] and invite['message_id']:
+            message = self.bot.get_partial_messageable(invite['channel_id']).get_partial_message(invite['message_id'])
+            await message.edit(view=view)
@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import collections
+import logging
+import re
+
+from utils.incremental import IncrementalState
+from utils.models import MAX_TEAM_SIZE
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from utils.models import TeamRecord, UserRecord
+
+logger = logging.getLogger()
+
+TOKEN_WEIGHTS = {
+    'school': 3,
+    'shsm': 2,
+    'grade': 1,
+    'kw': 1,
+}
+
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'for', 'from', 'have', 'i', 'im', 'in', 'is', 'it',
+    'like', 'looking', 'me', 'my', 'of', 'on', 'or', 'so', 'team', 'that', 'the', 'to', 'want', 'we', 'with', 'you',
+}
+
+def keyword_tokens(text: str | None) -> set[str]:
+    if not text:
+        return set()
+    return {f'kw:{word}' for word in re.findall(r'[a-z0-9+#]+', text.lower()) if len(word) > 1 and word not in STOPWORDS}
+
+def profile_tokens(school: str, grade: str | int, shsm_sector: str | None, about: str | None) -> set[str]:
+    tokens = {f'school:{school.lower().strip()}', f'grade:{str(grade).strip()}'}
+    if shsm_sector and shsm_sector.lower() != 'none':
+        tokens.add(f'shsm:{shsm_sector.lower().strip()}')
+    return tokens | keyword_tokens(about)
+
+def token_weight(token: str) -> int:
+    return TOKEN_WEIGHTS.get(token.split(':', 1)[0], 1)
+
+class IndexedUser:
+    def __init__(self, discord_id: int, school: str, grade: str, shsm_sector: str | None, about: str | None, team_id: int | None) -> None:
+        self.discord_id = discord_id
+        self.school = school
+        self.grade = grade
+        self.shsm_sector = shsm_sector
+        self.about = about
+        self.team_id = team_id
+        self.tokens = profile_tokens(school, grade, shsm_sector, about)
+
+class IndexedTeam:
+    def __init__(self, team_id: int, name: str) -> None:
+        self.id = team_id
+        self.name = name
+        self.member_ids: set[int] = set()
+        self.tokens: set[str] = set()
+
+    @property
+    def is_open(self) -> bool:
+        return len(self.member_ids) < MAX_TEAM_SIZE
+
+# Inverted index from profile tokens (school, grade, SHSM sector and keywords from the about text) to users without
+# a team and to teams with open slots. Built once from the database, then kept current by the bot's team events.
+class MatchmakingIndex(IncrementalState):
+    def __init__(self) -> None:
+        super().__init__()
+        self.users: dict[int, IndexedUser] = {}
+        self.teams: dict[int, IndexedTeam] = {}
+        self.solo_index: dict[str, set[int]] = collections.defaultdict(set)
+        self.team_index: dict[str, set[int]] = collections.defaultdict(set)
+
+    def load(self, teams: list[TeamRecord], users: list[UserRecord]) -> None:
+        for team in teams:
+            self.teams[team['id']] = IndexedTeam(team['id'], team['name'])
+
+        for user in users:
+            self.index_user(IndexedUser(user['discord_id'], user['school'], user['grade'], user['shsm_sector'], user['about'], user['team_id']))
+
+        for team in self.teams.values():
+            self.index_team(team)
+
+        self.mark_ready()
+        logger.info(f"Matchmaking index loaded with {len(self.users)} users and {len(self.teams)} teams")
+
+    def index_user(self, user: IndexedUser) -> None:
+        self.users[user.discord_id] = user
+        team = self.teams.get(user.team_id) if user.team_id is not None else None
+        if team is not None:
+            team.member_ids.add(user.discord_id)
+        else:
+            user.team_id = None
+            for token in user.tokens:
+                self.solo_index[token].add(user.discord_id)
+
+    def unindex_user(self, user: IndexedUser) -> None:
+        if user.team_id is None:
+            for token in user.tokens:
+                self.discard(self.solo_index, token, user.discord_id)
+
+    def index_team(self, team: IndexedTeam) -> None:
+        for token in team.tokens:
+            self.discard(self.team_index, token, team.id)
+
+        team.tokens = set()
+        for member_id in team.member_ids:
+            if user := self.users.get(member_id):
+                team.tokens |= user.tokens
+
+        if team.is_open:
+            for token in team.tokens:
+                self.team_index[token].add(team.id)
+
+    @staticmethod
+    def discard(index: dict[str, set[int]], token: str, key: int) -> None:
+        keys = index.get(token)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del index[token]
+
+    def add_user(self, discord_id: int, school: str, grade: str, shsm_sector: str | None) -> None:
+        if self.defer(self.add_user, discord_id, school, grade, shsm_sector) or discord_id in self.users:
+            return
+        self.index_user(IndexedUser(discord_id, school, grade, shsm_sector, None, None))
+
+    def update_about(self, discord_id: int, about: str | None) -> None:
+        if self.defer(self.update_about, discord_id, about) or (user := self.users.get(discord_id)) is None:
+            return
+        self.unindex_user(user)
+        user.about = about
+        user.tokens = profile_tokens(user.school, user.grade, user.shsm_sector, about)
+        self.index_user(user)
+        if user.team_id is not None:
+            self.index_team(self.teams[user.team_id])
+
+    def create_team(self, team_id: int, name: str, owner_id: int) -> None:
+        if self.defer(self.create_team, team_id, name, owner_id):
+            return
+        if team_id not in self.teams:
+            self.teams[team_id] = IndexedTeam(team_id, name)
+        self.join_team(team_id, owner_id)
+
+    def rename_team(self, team_id: int, name: str) -> None:
+        if self.defer(self.rename_team, team_id, name) or (team := self.teams.get(team_id)) is None:
+            return
+        team.name = name
+
+    def delete_team(self, team_id: int) -> None:
+        if self.defer(self.delete_team, team_id) or (team := self.teams.get(team_id)) is None:
+            return
+        for member_id in list(team.member_ids):
+            self.leave_team(team_id, member_id)
+        for token in team.tokens:
+            self.discard(self.team_index, token, team_id)
+        del self.teams[team_id]
+
+    def join_team(self, team_id: int, discord_id: int) -> None:
+        if self.defer(self.join_team, team_id, discord_id):
+            return
+        team = self.teams.get(team_id)
+        user = self.users.get(discord_id)
+        if team is None or user is None:
+            return
+        self.unindex_user(user)
+        user.team_id = team_id
+        team.member_ids.add(discord_id)
+        self.index_team(team)
+
+    def leave_team(self, team_id: int, discord_id: int) -> None:
+        if self.defer(self.leave_team, team_id, discord_id):
+            return
+        team = self.teams.get(team_id)
+        user = self.users.get(discord_id)
+        if team is not None:
+            team.member_ids.discard(discord_id)
+            self.index_team(team)
+        if user is not None and user.team_id == team_id:
+            user.team_id = None
+            self.index_user(user)
+
+    def tokens_for(self, discord_id: int) -> set[str]:
+        user = self.users.get(discord_id)
+        return set(user.tokens) if user else set()
+
+    @staticmethod
+    def rank(index: dict[str, set[int]], tokens: set[str], exclude: set[int], limit: int) -> list[tuple[int, int]]:
+        scores: collections.Counter[int] = collections.Counter()
+        for token in tokens:
+            weight = token_weight(token)
+            for key in index.get(token, ()):
+                scores[key] += weight
+        for key in exclude:
+            scores.pop(key, None)
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+    def find_users(self, tokens: set[str], exclude_id: int, limit: int = 10) -> list[tuple[IndexedUser, int]]:
+        return [(self.users[discord_id], score) for discord_id, score in self.rank(self.solo_index, tokens, {exclude_id}, limit)]
+
+    def find_teams(self, tokens: set[str], exclude_team_id: int | None, limit: int = 5) -> list[tuple[IndexedTeam, int]]:
+        exclude = {exclude_team_id} if exclude_team_id is not None else set()
+        return [(self.teams[team_id], score) for team_id, score in self.rank(self.team_index, tokens, exclude, limit)]
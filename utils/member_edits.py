@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import logging
+import time
+
+import discord
+
+from discord.utils import MISSING
+
+from typing import Any, Iterable
+
+logger = logging.getLogger()
+
+# Discord rejects longer nicknames with a 400
+MAX_NICK_LENGTH = 32
+
+class PendingMemberEdit:
+    def __init__(self, member: discord.Member) -> None:
+        self.member = member
+        self.add_roles: dict[int, discord.abc.Snowflake] = {}
+        self.remove_roles: set[int] = set()
+        self.nick: str | None = MISSING
+        self.futures: list[asyncio.Future[discord.HTTPException | None]] = []
+        self.queued_at = time.perf_counter()
+
+    def merge(self, add_roles: Iterable[discord.abc.Snowflake], remove_roles: Iterable[discord.abc.Snowflake], nick: str | None) -> None:
+        for role in add_roles:
+            self.remove_roles.discard(role.id)
+            self.add_roles[role.id] = role
+        for role in remove_roles:
+            self.add_roles.pop(role.id, None)
+            self.remove_roles.add(role.id)
+        if nick is not MISSING:
+            self.nick = nick
+
+    def edit_kwargs(self) -> dict[str, Any]:
+        # Use the freshest cached member so roles changed since queueing are not clobbered
+        member = self.member.guild.get_member(self.member.id) or self.member
+        kwargs: dict[str, Any] = {}
+        if self.add_roles or self.remove_roles:
+            roles: list[discord.abc.Snowflake] = [role for role in member.roles[1:] if role.id not in self.remove_roles]
+            current = {role.id for role in roles}
+            roles.extend(role for role_id, role in self.add_roles.items() if role_id not in current)
+            kwargs['roles'] = roles
+        if self.nick is not MISSING:
+            kwargs['nick'] = self.nick
+        return kwargs
+
+# Merges role and nickname changes for a member into a single Member.edit call. Member edits all share the
+# guild's PATCH /guilds/{guild_id}/members/{user_id} bucket, so they are dispatched one at a time in the
+# order members were queued instead of bursting into 429s. A rejected nickname (the member outranks the bot, or
+# Discord refuses the name) must not hold back the roles, so the edit is then retried without it. The futures returned
+# by edit() resolve to the nickname's error in that case, and only raise when the roles could not be applied.
+#
+# Edits someone is waiting on (a command's followup) are queued with `priority=True` and go out before the bulk edits
+# from join storms, which can otherwise keep the queue busy for longer than an interaction token lives.
+class MemberEditScheduler:
+    def __init__(self, coalesce_delay: float = 0.25, slow_threshold: float = 5.0) -> None:
+        self.coalesce_delay = coalesce_delay
+        self.slow_threshold = slow_threshold
+        self.pending: dict[int, PendingMemberEdit] = {}
+        # Members whose pending edit is a priority, in the order they were queued
+        self.priority: dict[int, None] = {}
+        self.wakeup = asyncio.Event()
+        self.task: asyncio.Task[None] | None = None
+
+        self.queue_latencies: collections.deque[float] = collections.deque(maxlen=1000)
+        self.requested_mutations = 0
+        self.sent_edits = 0
+        self.failed_edits = 0
+        self.failed_nicks = 0
+
+    def start(self) -> None:
+        if self.task is None:
+            self.task = asyncio.create_task(self.run(), name='member-edit-scheduler')
+
+    async def stop(self) -> None:
+        if self.task is None:
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
+
+        for edit in self.pending.values():
+            for future in edit.futures:
+                if not future.done():
+                    future.cancel()
+        self.pending.clear()
+        self.priority.clear()
+
+    def edit(
+        self,
+        member: discord.Member,
+        *,
+        add_roles: Iterable[discord.abc.Snowflake] = (),
+        remove_roles: Iterable[discord.abc.Snowflake] = (),
+        nick: str | None = MISSING,
+        priority: bool = False,
+    ) -> asyncio.Future[discord.HTTPException | None]:
+        add_roles = list(add_roles)
+        remove_roles = list(remove_roles)
+        if nick:
+            nick = nick[:MAX_NICK_LENGTH]
+        self.requested_mutations += len(add_roles) + len(remove_roles) + (nick is not MISSING)
+
+        edit = self.pending.get(member.id)
+        if edit is None:
+            edit = self.pending[member.id] = PendingMemberEdit(member)
+        edit.merge(add_roles, remove_roles, nick)
+        if priority:
+            self.priority[member.id] = None
+
+        future: asyncio.Future[discord.HTTPException | None] = asyncio.get_running_loop().create_future()
+        edit.futures.append(future)
+        self.wakeup.set()
+        return future
+
+    async def run(self) -> None:
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+
+            while self.pending:
+                member_id = next(iter(self.priority), None) or next(iter(self.pending))
+                edit = self.pending[member_id]
+                # Give callers a moment to queue follow-up changes for the same member
+                remaining = edit.queued_at + self.coalesce_delay - time.perf_counter()
+                if remaining > 0:
+                    await asyncio.sleep(remaining)
+
+                del self.pending[member_id]
+                self.priority.pop(member_id, None)
+                await self.dispatch(edit)
+
+    async def dispatch(self, edit: PendingMemberEdit) -> None:
+        latency = time.perf_counter() - edit.queued_at
+        self.queue_latencies.append(latency)
+        if latency > self.slow_threshold:
+            logger.warning(f"Member edit for {edit.member} waited {latency:.2f}s in the queue ({len(self.pending)} still pending)")
+
+        kwargs = edit.edit_kwargs()
+        error: Exception | None = None
+        nick_error: discord.HTTPException | None = None
+        if kwargs:
+            try:
+                nick_error = await self.send(edit.member, kwargs)
+            except Exception as e:
+                logger.exception(f"Failed to edit member {edit.member}")
+                self.failed_edits += 1
+                error = e
+
+        for future in edit.futures:
+            if future.done():
+                continue
+            if error is None:
+                future.set_result(nick_error)
+            else:
+                future.set_exception(error)
+
+    async def send(self, member: discord.Member, kwargs: dict[str, Any]) -> discord.HTTPException | None:
+        try:
+            await member.edit(**kwargs)
+        except discord.HTTPException as e:
+            if 'nick' not in kwargs:
+                raise
+            self.failed_nicks += 1
+            logger.warning(f"Failed to set the nickname of member {member} to {kwargs['nick']!r}: {e}")
+            if 'roles' in kwargs:
+                # The same edit without the nickname, so the roles still go through
+                await member.edit(roles=kwargs['roles'])
+                self.sent_edits += 1
+            return e
+
+        self.sent_edits += 1
+        return None
+
+    def stats(self) -> dict[str, float]:
+        latencies = sorted(self.queue_latencies)
+
+        def percentile(p: float) -> float:
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] if latencies else 0.0
+
+        return {
+            'pending': len(self.pending),
+            'requested_mutations': self.requested_mutations,
+            'sent_edits': self.sent_edits,
+            'failed_edits': self.failed_edits,
+            'failed_nicks': self.failed_nicks,
+            'queue_latency_p50': percentile(0.5),
+            'queue_latency_p99': percentile(0.99),
+            'queue_latency_max': latencies[-1] if latencies else 0.0,
+        }
@@ -2,6 +2,8 @@ from __future__ import annotations
 
 from typing import TypedDict
 
+MAX_TEAM_SIZE = 4
+
 class Registration(TypedDict):
     discord_username: str
     school: str
@@ -30,3 +32,21 @@ class UserRecord(TypedDict):
     team_id: int | None
     created_at: str
     updated_at: str
+
+class TeamInviteRecord(TypedDict):
+    id: int
+    team_id: int
+    user_id: int
+    invited_by: int
+    status: str
+    channel_id: int | None
+    message_id: int | None
+    created_at: str
+    expires_at: str
+    resolved_at: str | None
+
+class DeletedRowRecord(TypedDict):
+    id: int
+    table_name: str
+    row_id: int
+    deleted_at: str
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import datetime
+import logging
+
+from discord.ext import tasks
+
+from utils.incremental import IncrementalState
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from utils.database import Database
+    from utils.models import TeamRecord, TeamRecordWithCounts, UserRecord
+
+logger = logging.getLogger()
+
+# Rows are re-read from this far behind the newest updated_at seen, so rows from transactions that committed after a
+# later one are not missed. Re-reading a row is harmless because older versions never replace newer ones.
+SYNC_OVERLAP = datetime.timedelta(seconds=30)
+
+def newer(incoming: UserRecord | TeamRecord, existing: UserRecord | TeamRecord | None) -> bool:
+    return existing is None or not incoming['updated_at'] or not existing['updated_at'] or incoming['updated_at'] >= existing['updated_at']
+
+# In-memory copy of the users and teams tables, indexed the way the command handlers read them. It is bulk loaded
+# once, kept current by write-through from Database mutations, and reconciled with periodic delta syncs on updated_at
+# (maintained by a trigger) for changes made outside the bot. Until it is loaded, Database reads go to Supabase.
+class Replica(IncrementalState):
+    def __init__(self) -> None:
+        super().__init__()
+        self.users: dict[int, UserRecord] = {}
+        self.user_discord_ids: dict[int, int] = {}
+        self.teams: dict[int, TeamRecord] = {}
+        self.team_members: dict[int, set[int]] = collections.defaultdict(set)
+        self.watermark: str | None = None
+
+    def load(self, teams: list[TeamRecordWithCounts], users: list[UserRecord]) -> None:
+        for team in teams:
+            self.apply_team({key: value for key, value in team.items() if key != 'member_count'})  # type: ignore
+        for user in users:
+            self.apply_user(user)
+
+        self.mark_ready()
+        logger.info(f"Replica loaded with {len(self.users)} users and {len(self.teams)} teams")
+
+    def advance(self, timestamp: str | None) -> None:
+        if timestamp and (self.watermark is None or timestamp > self.watermark):
+            self.watermark = timestamp
+
+    def sync_since(self) -> str | None:
+        if self.watermark is None:
+            return None
+        return (datetime.datetime.fromisoformat(self.watermark) - SYNC_OVERLAP).isoformat()
+
+    def apply_user(self, user: UserRecord) -> None:
+        existing = self.users.get(user['discord_id'])
+        if not newer(user, existing):
+            return
+        if existing is not None and existing['team_id'] is not None:
+            self.team_members[existing['team_id']].discard(existing['discord_id'])
+        self.users[user['discord_id']] = user
+        self.user_discord_ids[user['id']] = user['discord_id']
+        if user['team_id'] is not None:
+            self.team_members[user['team_id']].add(user['discord_id'])
+        self.advance(user['updated_at'])
+
+    def apply_team(self, team: TeamRecord) -> None:
+        if newer(team, self.teams.get(team['id'])):
+            self.teams[team['id']] = team
+            self.advance(team['updated_at'])
+
+    def remove_user(self, user_id: int) -> None:
+        discord_id = self.user_discord_ids.pop(user_id, None)
+        user = self.users.get(discord_id) if discord_id is not None else None
+        # The Discord account may have been registered again under a new row since
+        if user is None or user['id'] != user_id:
+            return
+        del self.users[user['discord_id']]
+        if user['team_id'] is not None:
+            self.team_members[user['team_id']].discard(user['discord_id'])
+
+    def remove_team(self, team_id: int) -> None:
+        self.teams.pop(team_id, None)
+        # Members are released like ON DELETE SET NULL would
+        for discord_id in self.team_members.pop(team_id, set()):
+            self.users[discord_id] = {**self.users[discord_id], 'team_id': None}
+
+    # Write-through from Database mutations. Writes made while the replica is loading are replayed once it is ready.
+
+    def write_user(self, user: UserRecord) -> None:
+        if self.defer(self.write_user, user):
+            return
+        self.apply_user(user)
+
+    def write_team(self, team: TeamRecord) -> None:
+        if self.defer(self.write_team, team):
+            return
+        self.apply_team(team)
+
+    def write_team_delete(self, team_id: int) -> None:
+        if self.defer(self.write_team_delete, team_id):
+            return
+        self.remove_team(team_id)
+
+    # Reads
+
+    def user(self, discord_id: int) -> UserRecord | None:
+        return self.users.get(discord_id)
+
+    def team(self, team_id: int | None) -> TeamRecord | None:
+        return self.teams.get(team_id) if team_id is not None else None
+
+    def team_by_member_id(self, discord_id: int) -> TeamRecord | None:
+        user = self.users.get(discord_id)
+        return self.team(user['team_id']) if user else None
+
+    def members(self, team_id: int) -> set[int]:
+        return self.team_members.get(team_id, set())
+
+    def team_with_count(self, team: TeamRecord) -> TeamRecordWithCounts:
+        return {**team, 'member_count': len(self.members(team['id']))}  # type: ignore
+
+    def teams_with_counts(self) -> list[TeamRecordWithCounts]:
+        return [self.team_with_count(team) for team in self.teams.values()]
+
+# Periodically pulls rows changed or deleted since the replica's watermark
+class ReplicaSync:
+    def __init__(self, database: Database, interval: float = 30.0) -> None:
+        self.database = database
+        self.synced_rows = 0
+        self.sync_loop.change_interval(seconds=interval)
+
+    @tasks.loop(seconds=30.0)
+    async def sync_loop(self) -> None:
+        if not self.database.replica.ready:
+            return
+        try:
+            await self.sync()
+        except Exception:
+            logger.exception("Failed to sync the users and teams replica")
+
+    @sync_loop.before_loop
+    async def before_sync_loop(self) -> None:
+        # The replica was just loaded (or is being reconciled), so the first sync is due an interval from now
+        await asyncio.sleep(self.sync_loop.seconds or 0)
+
+    async def sync(self) -> None:
+        replica = self.database.replica
+        since = replica.sync_since()
+        teams = await self.database.fetch_teams_updated_since(since)
+        users = await self.database.fetch_users_updated_since(since)
+        deleted = await self.database.fetch_deleted_rows_since(since)
+
+        for team in teams:
+            replica.apply_team(team)
+        for user in users:
+            replica.apply_user(user)
+        for row in deleted:
+            if row['table_name'] == 'teams':
+                replica.remove_team(row['row_id'])
+            elif row['table_name'] == 'users':
+                replica.remove_user(row['row_id'])
+            replica.advance(row['deleted_at'])
+        self.synced_rows += len(teams) + len(users) + len(deleted)
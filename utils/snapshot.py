@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import asyncio
+import datetime
+import hashlib
+import json
+import logging
+import mmap
+import os
+import pathlib
+import struct
+import time
+
+from discord.ext import tasks
+from utils.backoff import retry_with_backoff
+
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from main import Bot
+    from utils.models import TeamInviteRecord
+
+logger = logging.getLogger()
+
+SNAPSHOT_MAGIC = b'YRHS'
+# Bump whenever the payload layout changes. Snapshots of another version are ignored and the bot starts cold.
+SNAPSHOT_VERSION = 3
+# Magic, version, SHA-256 of the payload and payload length
+SNAPSHOT_HEADER = struct.Struct('<4sH2x32sQ')
+
+class SnapshotError(Exception):
+    pass
+
+def write_snapshot(path: pathlib.Path, state: dict[str, Any]) -> int:
+    payload = json.dumps(state, separators=(',', ':')).encode()
+    header = SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, hashlib.sha256(payload).digest(), len(payload))
+
+    # Write next to the old snapshot and swap it in, so a crash mid-write never leaves a torn file behind
+    temporary = path.with_name(path.name + '.tmp')
+    with open(temporary, 'wb') as file:
+        file.write(header)
+        file.write(payload)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+    return len(header) + len(payload)
+
+def read_snapshot(path: pathlib.Path) -> dict[str, Any]:
+    try:
+        with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            if len(view) < SNAPSHOT_HEADER.size:
+                raise SnapshotError("Snapshot is truncated")
+
+            magic, version, digest, length = SNAPSHOT_HEADER.unpack_from(view)
+            if magic != SNAPSHOT_MAGIC:
+                raise SnapshotError("Not a snapshot file")
+            if version != SNAPSHOT_VERSION:
+                raise SnapshotError(f"Snapshot version {version} does not match {SNAPSHOT_VERSION}")
+            if len(view) != SNAPSHOT_HEADER.size + length:
+                raise SnapshotError("Snapshot is truncated")
+
+            payload = view[SNAPSHOT_HEADER.size:]
+    except (OSError, ValueError) as e:
+        raise SnapshotError(f"Snapshot could not be read: {e}") from e
+
+    if hashlib.sha256(payload).digest() != digest:
+        raise SnapshotError("Snapshot checksum does not match")
+    return json.loads(payload)
+
+# Periodically saves the bot's derived state (registration index, negative cache, users and teams replica and
+# pending invites) to a local file. On startup the snapshot is restored in place of the bulk load so commands are
+# served right away, then reconciled against Supabase in the background.
+class StateSnapshots:
+    def __init__(
+        self,
+        bot: Bot,
+        path: pathlib.Path,
+        interval: float = 60.0,
+        max_age: datetime.timedelta = datetime.timedelta(hours=12),
+    ) -> None:
+        self.bot = bot
+        self.path = path
+        self.max_age = max_age
+        self.save_loop.change_interval(seconds=interval)
+
+    @tasks.loop(seconds=60.0)
+    async def save_loop(self) -> None:
+        try:
+            await self.save()
+        except Exception:
+            logger.exception("Failed to save state snapshot")
+
+    @save_loop.before_loop
+    async def before_save_loop(self) -> None:
+        # The state was just loaded or restored, so there is nothing new to save yet
+        await asyncio.sleep(self.save_loop.seconds or 0)
+
+    def capture(self) -> dict[str, Any]:
+        replica = self.bot.database.replica
+        return {
+            'saved_at': time.time(),
+            # Only registrations promoted from the database; the registrations file is read fresh on every start
+            'registrations': [
+                (username, discord_id, self.bot.registrant_discord_mapping[username])
+                for username, discord_id in self.bot.promoted_registrants.items()
+                if username in self.bot.registrant_discord_mapping
+            ],
+            'non_registrants': self.bot.non_registrants.export(),
+            'watermark': replica.watermark,
+            'teams': list(replica.teams.values()),
+            'users': list(replica.users.values()),
+            'pending_invites': list(self.bot.stats.pending_invites),
+        }
+
+    async def save(self) -> None:
+        # Nothing worth saving until the replica has been loaded, and a partial snapshot would hide that on restart
+        if not self.bot.database.replica.ready:
+            return
+
+        started = time.perf_counter()
+        state = self.capture()
+        size = await asyncio.to_thread(write_snapshot, self.path, state)
+        logger.debug(f"Saved state snapshot ({size} bytes) in {(time.perf_counter() - started) * 1000:.1f}ms")
+
+    def restore(self) -> bool:
+        if not self.path.exists():
+            return False
+
+        started = time.perf_counter()
+        try:
+            state = read_snapshot(self.path)
+        except SnapshotError as e:
+            logger.warning(f"Ignoring state snapshot: {e}")
+            return False
+
+        # Catching up on an old snapshot costs about as much as the bulk load, and rows deleted since may have been
+        # pruned from deleted_rows so the sync would never remove them
+        age = time.time() - state['saved_at']
+        if age > self.max_age.total_seconds():
+            logger.warning(f"Ignoring state snapshot from {age:.0f}s ago, older than {self.max_age}")
+            return False
+
+        for username, discord_id, registration in state['registrations']:
+            self.bot.promote_registrant(username, discord_id, registration)
+        self.bot.non_registrants.restore(state['non_registrants'], elapsed=max(age, 0.0))
+
+        invites: list[TeamInviteRecord] = [
+            {'team_id': team_id, 'user_id': user_id, 'status': 'pending'}  # type: ignore
+            for team_id, user_id in state['pending_invites']
+        ]
+        replica = self.bot.database.replica
+        replica.load(state['teams'], state['users'])
+        replica.advance(state['watermark'])
+        self.bot.matchmaking.load(state['teams'], state['users'])
+        self.bot.stats.load(replica.teams_with_counts(), state['users'], invites)
+
+        logger.info(f"Restored state snapshot from {age:.0f}s ago in {(time.perf_counter() - started) * 1000:.1f}ms")
+        return True
+
+    async def reconcile(self) -> None:
+        # Catch up on everything that changed after the snapshot was taken, including while the bot was down
+        async def fetch() -> list[TeamInviteRecord]:
+            await self.bot.replica_sync.sync()
+            return await self.bot.database.fetch_all_team_invites()
+
+        invites = await retry_with_backoff(fetch, "reconcile the state snapshot with the database")
+
+        # Registrants promoted from users rows that were deleted while the bot was down
+        replica = self.bot.database.replica
+        for username, discord_id in list(self.bot.promoted_registrants.items()):
+            if replica.user(discord_id) is None:
+                self.bot.drop_promoted_registrant(username)
+
+        self.bot.rebuild_event_state(invites)
+        logger.info("Reconciled state snapshot with the database")
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import collections
+import logging
+
+from utils.incremental import IncrementalState
+
+from typing import TYPE_CHECKING, Iterable
+
+if TYPE_CHECKING:
+    from utils.models import Registration, TeamInviteRecord, TeamRecord, UserRecord
+
+logger = logging.getLogger()
+
+# Aggregate event statistics for /admin stats. Counters are built once from a bulk database read and then updated
+# from the same bot events as the matchmaking index, so reading them never touches the database.
+class EventStats(IncrementalState):
+    def __init__(self) -> None:
+        super().__init__()
+        self.registrations = 0
+        self.verified: set[int] = set()
+        self.unverified: set[int] = set()
+        self.schools: collections.Counter[str] = collections.Counter()
+        self.grades: collections.Counter[str] = collections.Counter()
+        self.shsm_sectors: collections.Counter[str] = collections.Counter()
+        self.team_members: dict[int, set[int]] = {}
+        self.team_fill: collections.Counter[int] = collections.Counter()
+        self.pending_invites: set[tuple[int, int]] = set()
+
+    def load(self, teams: list[TeamRecord], users: list[UserRecord], invites: list[TeamInviteRecord]) -> None:
+        for team in teams:
+            self.team_members[team['id']] = set()
+        for user in users:
+            self.count_user(user['discord_id'], user['school'], user['grade'], user['shsm_sector'])
+            if user['team_id'] in self.team_members:
+                self.team_members[user['team_id']].add(user['discord_id'])
+        self.team_fill.update(len(members) for members in self.team_members.values())
+        self.pending_invites.update((invite['team_id'], invite['user_id']) for invite in invites if invite['status'] == 'pending')
+
+        self.mark_ready()
+        logger.info(f"Event statistics loaded with {len(self.verified)} users and {len(self.team_members)} teams")
+
+    def load_unverified(self, member_ids: Iterable[int]) -> None:
+        # Unverified members come from the guild's member cache, which is only available once the bot is ready
+        self.unverified = set(member_ids) - self.verified
+
+    def count_user(self, discord_id: int, school: str, grade: str | int, shsm_sector: str | None) -> None:
+        if discord_id in self.verified:
+            return
+        self.verified.add(discord_id)
+        self.unverified.discard(discord_id)
+        self.schools[school.strip()] += 1
+        self.grades[str(grade).strip()] += 1
+        self.shsm_sectors[(shsm_sector or 'None').strip()] += 1
+
+    def add_registrant(self, discord_id: int, registration: Registration) -> None:
+        if self.defer(self.add_registrant, discord_id, registration):
+            return
+        self.count_user(discord_id, registration['school'], registration['grade'], registration['shsm_sector'])
+
+    def add_unverified(self, discord_id: int) -> None:
+        if discord_id not in self.verified:
+            self.unverified.add(discord_id)
+
+    def remove_member(self, discord_id: int) -> None:
+        self.unverified.discard(discord_id)
+
+    def set_membership(self, team_id: int, member_id: int, joined: bool) -> None:
+        members = self.team_members.get(team_id)
+        if members is None:
+            return
+        self.team_fill[len(members)] -= 1
+        if joined:
+            members.add(member_id)
+        else:
+            members.discard(member_id)
+        self.team_fill[len(members)] += 1
+
+    def create_team(self, team_id: int, owner_id: int) -> None:
+        if self.defer(self.create_team, team_id, owner_id):
+            return
+        if team_id not in self.team_members:
+            self.team_members[team_id] = set()
+            self.team_fill[0] += 1
+        self.set_membership(team_id, owner_id, True)
+
+    def delete_team(self, team_id: int) -> None:
+        if self.defer(self.delete_team, team_id) or (members := self.team_members.pop(team_id, None)) is None:
+            return
+        self.team_fill[len(members)] -= 1
+        self.pending_invites = {invite for invite in self.pending_invites if invite[0] != team_id}
+
+    def join_team(self, team_id: int, member_id: int) -> None:
+        if self.defer(self.join_team, team_id, member_id):
+            return
+        self.set_membership(team_id, member_id, True)
+
+    def leave_team(self, team_id: int, member_id: int) -> None:
+        if self.defer(self.leave_team, team_id, member_id):
+            return
+        self.set_membership(team_id, member_id, False)
+
+    def add_invite(self, team_id: int, user_id: int) -> None:
+        if self.defer(self.add_invite, team_id, user_id):
+            return
+        self.pending_invites.add((team_id, user_id))
+
+    def resolve_invite(self, team_id: int, user_id: int) -> None:
+        if self.defer(self.resolve_invite, team_id, user_id):
+            return
+        self.pending_invites.discard((team_id, user_id))
+
+    @property
+    def teams(self) -> int:
+        return len(self.team_members)
+
+    @property
+    def members_in_teams(self) -> int:
+        return sum(size * count for size, count in self.team_fill.items())
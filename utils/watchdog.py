@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import asyncio
+import bisect
+import collections
+import logging
+import pathlib
+import sys
+import threading
+import time
+import traceback
+
+from typing import Any
+
+logger = logging.getLogger()
+
+ROOT = pathlib.Path(__file__).parent.parent
+
+# Upper bounds of the lag histogram buckets in seconds. The last bucket counts everything above 5 seconds.
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+class Stall:
+    def __init__(self, started_at: float, site: str, handler: str | None, task: str | None, stack: list[str]) -> None:
+        self.started_at = started_at
+        self.site = site
+        self.handler = handler
+        self.task = task
+        self.stack = stack
+        self.duration = 0.0
+
+    def describe(self) -> str:
+        description = f"{self.duration * 1000:.0f}ms in {self.site}"
+        if self.handler:
+            description += f" (handler {self.handler})"
+        if self.task:
+            description += f" (task {self.task!r})"
+        return description
+
+def attribute(frame: Any) -> tuple[str, str | None, list[str]]:
+    # Frames are read from the watchdog thread while the loop thread keeps running, so only cheap frame attributes
+    # are touched and source lines are not looked up
+    stack = traceback.StackSummary.extract(traceback.walk_stack(frame), lookup_lines=False)
+    stack.reverse()
+
+    def relative(filename: str) -> str | None:
+        try:
+            return pathlib.Path(filename).relative_to(ROOT).as_posix()
+        except ValueError:
+            return None
+
+    frames = [(relative(summary.filename), summary) for summary in stack]
+    own = [(path, summary) for path, summary in frames if path is not None and not path.startswith(('venv/', '.venv/'))]
+    path, summary = own[-1] if own else (stack[-1].filename, stack[-1])
+    site = f"{path}:{summary.lineno} in {summary.name}"
+
+    # The outermost cog or view frame names the command, button or autocomplete that led here
+    handler = next((f"{pathlib.Path(path).stem} {summary.name}" for path, summary in own if path.startswith(('cogs/', 'views/'))), None)
+    return site, handler, [f"{path or summary.filename}:{summary.lineno} in {summary.name}" for path, summary in frames]
+
+# Measures event loop lag continuously and attributes stalls. A coroutine wakes up every `interval` seconds and records
+# how late it was into a histogram. A daemon thread watches that coroutine's heartbeat, and once it is more than
+# `threshold` seconds overdue, samples the loop thread's stack to find the code that is blocking it.
+class LoopWatchdog:
+    def __init__(self, interval: float = 0.1, threshold: float = 0.25, history: int = 20) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self.histogram = [0] * (len(LAG_BUCKETS) + 1)
+        self.samples = 0
+        self.max_lag = 0.0
+        self.stalls: collections.deque[Stall] = collections.deque(maxlen=history)
+        self.stall_sites: collections.Counter[str] = collections.Counter()
+        self.heartbeat = time.monotonic()
+        self.current_stall: Stall | None = None
+        self.task: asyncio.Task[None] | None = None
+        self.thread: threading.Thread | None = None
+        self.stopping = threading.Event()
+
+    def start(self) -> None:
+        if self.task is not None:
+            return
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread_id = threading.get_ident()
+        self.heartbeat = time.monotonic()
+        self.stopping.clear()
+        self.task = asyncio.create_task(self.run(), name='loop-watchdog')
+        self.thread = threading.Thread(target=self.watch, name='loop-watchdog', daemon=True)
+        self.thread.start()
+
+    async def stop(self) -> None:
+        if self.task is None:
+            return
+        self.stopping.set()
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
+        self.thread = None
+
+    async def run(self) -> None:
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self.heartbeat = now = time.monotonic()
+            self.record(max(now - started - self.interval, 0.0))
+
+    def record(self, lag: float) -> None:
+        self.samples += 1
+        self.histogram[bisect.bisect_left(LAG_BUCKETS, lag)] += 1
+        self.max_lag = max(self.max_lag, lag)
+
+        stall, self.current_stall = self.current_stall, None
+        if lag < self.threshold:
+            return
+        if stall is None:
+            # Too short for the watchdog thread to catch it in the act
+            stall = Stall(time.time() - lag, "unknown site", None, None, [])
+        stall.duration = lag
+        self.stalls.append(stall)
+        self.stall_sites[stall.site] += 1
+        logger.warning(f"Event loop blocked for {stall.describe()}")
+        if stall.stack:
+            logger.debug("Blocking stack (oldest call first):\n" + '\n'.join(stall.stack))
+
+    def watch(self) -> None:
+        # Poll well within the threshold so stalls just over it are still caught while they last
+        while not self.stopping.wait(min(self.interval, self.threshold) / 4):
+            heartbeat = self.heartbeat
+            if self.current_stall is not None or time.monotonic() - heartbeat < self.interval + self.threshold:
+                continue
+
+            frame = sys._current_frames().get(self.loop_thread_id)
+            if frame is None:
+                continue
+            try:
+                site, handler, stack = attribute(frame)
+            except Exception:
+                continue
+            finally:
+                del frame
+            task = asyncio.current_task(self.loop)
+            # The loop may have caught up while the stack was being read
+            if self.heartbeat == heartbeat:
+                self.current_stall = Stall(time.time(), site, handler, task.get_name() if task else None, stack)
+
+    def percentile(self, p: float) -> float:
+        # Upper bound of the bucket holding the p-th sample, capped at the largest lag seen
+        target = self.samples * p
+        seen = 0
+        for bound, count in zip((*LAG_BUCKETS, float('inf')), self.histogram):
+            seen += count
+            if count and seen >= target:
+                return min(bound, self.max_lag)
+        return 0.0
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'samples': self.samples,
+            'lag_p50': self.percentile(0.5),
+            'lag_p99': self.percentile(0.99),
+            'lag_max': self.max_lag,
+            'stalls': sum(self.stall_sites.values()),
+            'top_sites': self.stall_sites.most_common(3),
+            'last_stall': self.stalls[-1] if self.stalls else None,
+        }
@@ -29,10 +29,20 @@ class TeamInviteView(discord.ui.View):
             return
 
         user = interaction.user
+        self.bot.invite_sweeper.untrack(self.team_id, user.id)
         if accepted:
-            await self.bot.database.accept_team_invite(user, self.team_id)
+            resolved = await self.bot.database.accept_team_invite(user, self.team_id)
         else:
-            await self.bot.database.decline_team_invite(user, self.team_id)
+            resolved = await self.bot.database.decline_team_invite(user, self.team_id)
+
+        if not resolved:
+            await self.close(interaction)
+            await interaction.followup.send(embed=self.bot.error_embed("This invite has expired."))
+            return
+
+        if accepted:
+            self.bot.dispatch('team_join', self.team_id, user.id)
+        self.bot.dispatch('team_invite_resolve', self.team_id, user.id)
 
         status = "accepted" if accepted else "declined"
         await interaction.followup.send(embed=self.bot.info_embed(f"You have __{status}__ the invite to join `{self.team_name}`."))
@@ -43,11 +53,21 @@ class TeamInviteView(discord.ui.View):
         except discord.Forbidden:
             pass  # Can't DM inviter
 
+        await self.close(interaction)
+
+    async def close(self, interaction: discord.Interaction) -> None:
+        self.disable()
+        if interaction.message is None:
+            return
+        try:
+            await interaction.message.edit(view=self)
+        except discord.HTTPException:
+            pass  # The view is stopped either way, so the buttons no longer do anything
+
+    def disable(self) -> None:
         for child in cast(list[discord.ui.Button], self.children):
             child.disabled = True
-
         self.stop()
-        # await interaction.followup.edit_message(message.id, view=self)
 
     @discord.ui.button(label="Accept", style=discord.ButtonStyle.success)
     async def accept(self, interaction: discord.Interaction, _: discord.ui.Button) -> None: